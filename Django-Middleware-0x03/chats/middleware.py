@@ -1,83 +1,171 @@
+import hmac
 import logging
-from datetime import datetime, time, timedelta
+import random
+from datetime import datetime, timedelta
+from django.conf import settings
 from django.http import HttpResponse, JsonResponse
 from collections import defaultdict
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 
+from .profiling import start_profiler, stop_profiler
+from .schedule import Schedule
+
+
+class AsyncCapableMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI.
+
+    Django passes an async get_response when the rest of the chain is async;
+    the middleware then marks itself as a coroutine function and serves the
+    request through ``__acall__``, so no sync_to_async thread hop is needed.
+    Subclasses implement ``process(request, user)`` returning a response to
+    short-circuit or None to continue. ``needs_user`` controls whether the
+    user is resolved first.
+    """
+    sync_capable = True
+    async_capable = True
+    needs_user = False
 
-class RequestLoggingMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        user = request.user if self.needs_user else None
+        response = self.process(request, user)
+        if response is not None:
+            return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        user = await request.auser() if self.needs_user else None
+        response = self.process(request, user)
+        if response is not None:
+            return response
+        return await self.get_response(request)
+
+    def process(self, request, user):
+        return None
+
+
+class RequestLoggingMiddleware(AsyncCapableMiddleware):
+    needs_user = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
         self.logger = logging.getLogger(__name__)
         handler = logging.FileHandler('requests.log')
         formatter = logging.Formatter('%(message)s')
         handler.setFormatter(formatter)
         self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
-        
-    def __call__(self, request):
+
+    def process(self, request, user):
         # Code to be executed for each request before
         # the view (and later middleware) are called.
-        user = request.user if request.user.is_authenticated else "Anonymous"
+        user = user if user.is_authenticated else "Anonymous"
         self.logger.info(f"{datetime.now()} - User: {user} - Path: {request.path}")
-        
-        response = self.get_response(request)
-         # Code to be executed for each request/response after
-        # the view is called.
-        
-        return response
-    
-    
-class RestrictAccessByTimeMiddleware:
+        return None
+
+
+class RestrictAccessByTimeMiddleware(AsyncCapableMiddleware):
+    """
+    Deny requests outside opening hours, configured by ACCESS_SCHEDULE:
+
+        ACCESS_SCHEDULE = {
+            'timezone': 'Africa/Lagos',        # default: TIME_ZONE
+            'windows': [('09:00', '18:00')],   # default windows
+            'exempt_paths': ['/health/'],      # path prefixes never restricted
+            'rules': [                         # first match wins
+                {'path': '/api/admin/', 'roles': ['admin'], 'windows': [('00:00', '24:00')]},
+                {'path': '/api/', 'timezone': 'Europe/London',
+                 'windows': [('08:00', '20:00', [0, 1, 2, 3, 4])]},
+            ],
+        }
+
+    Rules match on path prefix and, if ``roles`` is given, the user's role.
+    They inherit the default timezone and windows. Everything is built once
+    here; per request, the open/closed answer comes from each schedule's
+    cached deadline (see chats.schedule).
+    """
+
     def __init__(self, get_response):
-        self.get_response = get_response
-        
-    def __call__(self, request):
-        current_time = datetime.now().time()
-        if current_time < time(9, 0) or current_time > time(18, 0):
-            return HttpResponse("Access denied", status=403)
-        else:
-            return self.get_response(request)
+        super().__init__(get_response)
+        config = getattr(settings, 'ACCESS_SCHEDULE', {})
+        timezone = config.get('timezone', settings.TIME_ZONE)
+        windows = config.get('windows', [('09:00', '18:00')])
+        self.exempt_paths = tuple(config.get('exempt_paths', ()))
+        self.default_schedule = Schedule(windows, timezone)
+        self.rules = [
+            (
+                rule.get('path', '/'),
+                frozenset(rule['roles']) if 'roles' in rule else None,
+                Schedule(rule.get('windows', windows), rule.get('timezone', timezone)),
+            )
+            for rule in config.get('rules', [])
+        ]
+        # Only resolve the user when some rule depends on the role
+        self.needs_user = any(roles is not None for _, roles, _ in self.rules)
+
+    def process(self, request, user):
+        if request.path.startswith(self.exempt_paths):
+            return None
+        schedule = self.schedule_for(request.path, user)
+        if schedule.is_open():
+            return None
+        response = HttpResponse("Access denied", status=403)
+        response['Retry-After'] = str(schedule.seconds_until_open())
+        return response
+
+    def schedule_for(self, path, user):
+        for prefix, roles, schedule in self.rules:
+            if path.startswith(prefix) and (roles is None or getattr(user, 'role', None) in roles):
+                return schedule
+        return self.default_schedule
 
 
-class OffensiveLanguageMiddleware:
+class OffensiveLanguageMiddleware(AsyncCapableMiddleware):
     def __init__(self, get_response):
-        self.get_response = get_response
+        super().__init__(get_response)
         # Dictionary to store IP addresses and their message timestamps
         self.ip_message_timestamps = defaultdict(list)
         # Rate limit: 5 messages per minute
         self.max_messages = 5
         self.time_window_minutes = 1
-        
-    def __call__(self, request):
+
+    def process(self, request, user):
         # Get the client IP address
         ip_address = self.get_client_ip(request)
-        
+
         # Check if this is a POST request to a message endpoint
-        if (request.method == 'POST' and 
+        if (request.method == 'POST' and
             ('messages' in request.path or 'conversation-messages' in request.path)):
-            
+
             current_time = datetime.now()
-            
+
             # Clean old timestamps outside the time window
             cutoff_time = current_time - timedelta(minutes=self.time_window_minutes)
             self.ip_message_timestamps[ip_address] = [
                 timestamp for timestamp in self.ip_message_timestamps[ip_address]
                 if timestamp > cutoff_time
             ]
-            
+
             # Check if IP has exceeded the rate limit
             if len(self.ip_message_timestamps[ip_address]) >= self.max_messages:
                 return JsonResponse({
                     'error': 'Rate limit exceeded. You can only send 5 messages per minute.',
                     'retry_after': 60  # seconds
                 }, status=429)
-            
+
             # Add current timestamp to the IP's message history
             self.ip_message_timestamps[ip_address].append(current_time)
-        
-        response = self.get_response(request)
-        return response
-    
+
+        return None
+
     def get_client_ip(self, request):
         """Get the client IP address from the request."""
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -88,9 +176,11 @@ class OffensiveLanguageMiddleware:
         return ip
 
 
-class RolepermissionMiddleware:
+class RolePermissionMiddleware(AsyncCapableMiddleware):
+    needs_user = True
+
     def __init__(self, get_response):
-        self.get_response = get_response
+        super().__init__(get_response)
         # Define protected paths that require admin/moderator access
         self.protected_paths = [
             '/admin/',
@@ -100,43 +190,97 @@ class RolepermissionMiddleware:
         ]
         # Define admin/moderator roles
         self.allowed_roles = ['admin', 'moderator']
-        
-    def __call__(self, request):
+
+    def process(self, request, user):
         # Check if the request path requires role-based access
         if self.requires_role_check(request):
             # Check if user is authenticated
-            if not request.user.is_authenticated:
+            if not user.is_authenticated:
                 return JsonResponse({
                     'error': 'Authentication required to access this resource.'
                 }, status=401)
-            
+
             # Check if user has required role
-            if not self.has_required_role(request.user):
+            if not self.has_required_role(user):
                 return JsonResponse({
                     'error': 'Access denied. Admin or moderator role required.'
                 }, status=403)
-        
-        response = self.get_response(request)
-        return response
-    
+
+        return None
+
     def requires_role_check(self, request):
         """Check if the request path requires role-based access control."""
         path = request.path
-        
+
         # Check for exact matches or path prefixes
         for protected_path in self.protected_paths:
             if path.startswith(protected_path):
                 return True
-        
+
         # Additional logic: Check for specific HTTP methods on certain paths
-        if (request.method in ['POST', 'PUT', 'PATCH', 'DELETE'] and 
+        if (request.method in ['POST', 'PUT', 'PATCH', 'DELETE'] and
             ('conversations' in path or 'messages' in path)):
             return True
-            
+
         return False
-    
+
     def has_required_role(self, user):
         """Check if the user has admin or moderator role."""
         if hasattr(user, 'role'):
             return user.role in self.allowed_roles
-        return False
\ No newline at end of file
+        return False
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """
+    Opt-in profiling of the rest of the chain, aggregated per route in
+    chats.profiling.profile_store and downloadable from /api/profiling/.
+
+    A request is profiled when its X-Profile header matches PROFILING_TOKEN,
+    or at random with probability PROFILING_SAMPLE_RATE. PROFILING_MODE
+    picks 'sample' (stack sampling every PROFILING_INTERVAL seconds) or
+    'cprofile'. Both default to off, so unprofiled requests cost one
+    random() call.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.token = getattr(settings, 'PROFILING_TOKEN', '')
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.mode = getattr(settings, 'PROFILING_MODE', 'sample')
+        self.interval = getattr(settings, 'PROFILING_INTERVAL', 0.005)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = start_profiler(self.mode, self.interval)
+        try:
+            return self.get_response(request)
+        finally:
+            stop_profiler(profiler, self.route(request))
+
+    async def __acall__(self, request):
+        if not self.should_profile(request):
+            return await self.get_response(request)
+        profiler = start_profiler(self.mode, self.interval)
+        try:
+            return await self.get_response(request)
+        finally:
+            stop_profiler(profiler, self.route(request))
+
+    def should_profile(self, request):
+        header = request.headers.get('X-Profile')
+        if header and self.token and hmac.compare_digest(header, self.token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def route(self, request):
+        """URL name rather than path, so ids in the path do not split the totals."""
+        match = getattr(request, 'resolver_match', None)
+        return f"{request.method} {match.view_name if match is not None else '<unresolved>'}"
+
+
+# Previous class name, kept for existing imports
+RolepermissionMiddleware = RolePermissionMiddleware
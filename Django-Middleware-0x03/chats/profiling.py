@@ -0,0 +1,133 @@
+"""
+Per-route profile aggregation for ProfilingMiddleware.
+
+Two profilers are supported:
+
+- ``cprofile``: deterministic, exact call counts, noticeable overhead.
+  Aggregated per route as pstats data.
+- ``sample``: a background thread records the request thread's stack every
+  PROFILING_INTERVAL seconds. Overhead is small and independent of call
+  volume. Aggregated per route as flamegraph-style collapsed stacks.
+
+Under ASGI the request runs on the event loop thread, so both profilers
+also see other tasks running on the loop at the same time.
+"""
+import cProfile
+import marshal
+import pstats
+import sys
+import threading
+from collections import Counter
+
+
+class StackSampler:
+    """Count the stacks of one thread, sampled from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            # Drop a sample taken while the request thread was already stopping us
+            if stack and not self._stop.is_set():
+                self.stacks[';'.join(reversed(stack))] += 1
+
+
+class ProfileStore:
+    """Thread-safe per-route totals of pstats data and collapsed stacks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._stats = {}
+            self._stacks = {}
+            self._requests = Counter()
+
+    def add_profile(self, route, profiler):
+        with self._lock:
+            if route in self._stats:
+                self._stats[route].add(profiler)
+            else:
+                self._stats[route] = pstats.Stats(profiler)
+            self._requests[route, 'cprofile'] += 1
+
+    def add_stacks(self, route, stacks):
+        with self._lock:
+            self._stacks.setdefault(route, Counter()).update(stacks)
+            self._requests[route, 'sample'] += 1
+
+    def summary(self):
+        """Profiled request counts per route and profiler."""
+        with self._lock:
+            routes = {}
+            for (route, mode), count in self._requests.items():
+                routes.setdefault(route, {})[mode] = count
+            return routes
+
+    def pstats_dump(self, route):
+        """Marshalled stats, loadable with pstats.Stats(path), or None."""
+        with self._lock:
+            stats = self._stats.get(route)
+            return marshal.dumps(stats.stats) if stats is not None else None
+
+    def collapsed(self, route):
+        """Collapsed stacks for flamegraph.pl or speedscope, or None."""
+        with self._lock:
+            stacks = self._stacks.get(route)
+            if stacks is None:
+                return None
+            return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+profile_store = ProfileStore()
+
+# One cProfile at a time: from Python 3.12 a second active profiler raises
+_cprofile_lock = threading.Lock()
+
+
+def start_profiler(mode, interval):
+    """
+    Start profiling the current thread; returns an object for stop_profiler.
+    Falls back to the sampler while another request holds cProfile.
+    """
+    if mode == 'cprofile' and _cprofile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except Exception:
+            _cprofile_lock.release()
+            raise
+        return profiler
+    sampler = StackSampler(threading.get_ident(), interval)
+    sampler.start()
+    return sampler
+
+
+def stop_profiler(profiler, route):
+    """Stop a profiler from start_profiler and add its data to profile_store."""
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        _cprofile_lock.release()
+        profile_store.add_profile(route, profiler)
+    else:
+        profile_store.add_stacks(route, profiler.stop())
@@ -0,0 +1,91 @@
+"""
+Opening-hours schedules for RestrictAccessByTimeMiddleware.
+
+A Schedule is a set of daily windows in one timezone. Deciding whether it
+is open also yields when that answer next changes. Schedule.is_open()
+caches the answer against a time.monotonic() deadline, so between
+boundaries a request costs one float comparison and no datetime work.
+"""
+import time as monotonic_clock
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+ALL_DAYS = frozenset(range(7))
+
+# Longest time an answer is trusted, in case the wall clock is adjusted
+MAX_CACHE_SECONDS = 300
+
+
+def parse_time(value):
+    """'HH:MM' to minutes after midnight; '24:00' is accepted as an end time."""
+    hours, minutes = (int(part) for part in value.split(':'))
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or (hours == 24 and minutes):
+        raise ValueError(f'Invalid time of day: {value!r}')
+    return hours * 60 + minutes
+
+
+class Schedule:
+    """
+    Daily windows in one timezone. ``windows`` holds ('HH:MM', 'HH:MM')
+    pairs, or triples with a list of weekdays (0 is Monday). A window whose
+    end is not after its start runs past midnight.
+    """
+
+    def __init__(self, windows, timezone):
+        self.tz = ZoneInfo(timezone)
+        self.windows = []
+        for window in windows:
+            start, end = parse_time(window[0]), parse_time(window[1])
+            days = frozenset(window[2]) if len(window) > 2 else ALL_DAYS
+            self.windows.append((start, end if end > start else end + 24 * 60, days))
+        self._open = False
+        self._deadline = float('-inf')
+
+    def intervals(self, now):
+        """Open intervals as aware datetimes, merged, from yesterday to a week ahead."""
+        today = now.astimezone(self.tz).date()
+        spans = []
+        for offset in range(-1, 8):
+            day = today + timedelta(days=offset)
+            midnight = datetime.combine(day, time(), tzinfo=self.tz)
+            for start, end, days in self.windows:
+                if day.weekday() in days:
+                    spans.append((midnight + timedelta(minutes=start), midnight + timedelta(minutes=end)))
+        merged = []
+        for start, end in sorted(spans):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def state_at(self, now):
+        """Return (is_open, next_change) for the aware datetime ``now``."""
+        for start, end in self.intervals(now):
+            if start <= now < end:
+                return True, end
+            if now < start:
+                return False, start
+        return False, now + timedelta(days=1)
+
+    @staticmethod
+    def seconds_between(earlier, later):
+        # Aware datetimes sharing a tzinfo subtract as wall time; go through
+        # UTC so a DST change in between is counted
+        return (later.astimezone(dt_timezone.utc) - earlier.astimezone(dt_timezone.utc)).total_seconds()
+
+    def is_open(self):
+        """Whether the schedule is open now, recomputed only after the cached boundary."""
+        clock = monotonic_clock.monotonic()
+        if clock < self._deadline:
+            return self._open
+        now = datetime.now(self.tz)
+        self._open, next_change = self.state_at(now)
+        self._deadline = clock + min(self.seconds_between(now, next_change), MAX_CACHE_SECONDS)
+        return self._open
+
+    def seconds_until_open(self):
+        """Seconds until the next opening, for Retry-After; 0 when open."""
+        now = datetime.now(self.tz)
+        is_open, next_change = self.state_at(now)
+        return 0 if is_open else max(int(self.seconds_between(now, next_change)), 1)
@@ -1,3 +1,276 @@
-from django.test import TestCase
+import marshal
+import os
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import middleware as middleware_module
+from . import schedule as schedule_module
+from .middleware import AsyncCapableMiddleware, ProfilingMiddleware, RestrictAccessByTimeMiddleware
+from .models import Conversation, Message, User
+from .profiling import profile_store
+from .schedule import MAX_CACHE_SECONDS, Schedule, parse_time
+
+LONDON = ZoneInfo('Europe/London')
+ALWAYS = [('00:00', '24:00')]
+
+
+def london(*args):
+    return datetime(*args, tzinfo=LONDON)
+
+
+class ScheduleTests(SimpleTestCase):
+    """Test opening windows and the next boundary"""
+
+    def test_parse_time(self):
+        """Test HH:MM parsing, 24:00 and invalid values"""
+        self.assertEqual(parse_time('09:30'), 570)
+        self.assertEqual(parse_time('24:00'), 1440)
+        for value in ('24:01', '12:60', '-1:00'):
+            with self.assertRaises(ValueError):
+                parse_time(value)
+
+    def test_state_at_daily_window(self):
+        """Test open and closed times report the next change"""
+        schedule = Schedule([('09:00', '18:00')], 'Europe/London')
+        self.assertEqual(schedule.state_at(london(2024, 1, 15, 10)), (True, london(2024, 1, 15, 18)))
+        self.assertEqual(schedule.state_at(london(2024, 1, 15, 18)), (False, london(2024, 1, 16, 9)))
+        self.assertEqual(schedule.state_at(london(2024, 1, 15, 8, 59)), (False, london(2024, 1, 15, 9)))
+
+    def test_state_at_overnight_window(self):
+        """Test a window past midnight is open on both sides of it"""
+        schedule = Schedule([('22:00', '02:00')], 'Europe/London')
+        self.assertEqual(schedule.state_at(london(2024, 1, 15, 23)), (True, london(2024, 1, 16, 2)))
+        self.assertEqual(schedule.state_at(london(2024, 1, 16, 1)), (True, london(2024, 1, 16, 2)))
+        self.assertEqual(schedule.state_at(london(2024, 1, 16, 3)), (False, london(2024, 1, 16, 22)))
+
+    def test_state_at_weekdays_and_merging(self):
+        """Test weekday sets skip the weekend and adjacent windows merge"""
+        schedule = Schedule([('09:00', '12:00', [0, 1, 2, 3, 4]), ('12:00', '17:00', [0, 1, 2, 3, 4])],
+                            'Europe/London')
+        # Friday 2024-01-19
+        self.assertEqual(schedule.state_at(london(2024, 1, 19, 10)), (True, london(2024, 1, 19, 17)))
+        self.assertEqual(schedule.state_at(london(2024, 1, 19, 18)), (False, london(2024, 1, 22, 9)))
+
+    def test_state_at_other_timezone(self):
+        """Test ``now`` in another timezone is compared in the schedule's"""
+        schedule = Schedule([('09:00', '18:00')], 'Asia/Tokyo')
+        utc = datetime(2024, 1, 15, 1, tzinfo=ZoneInfo('UTC'))  # 10:00 in Tokyo
+        is_open, next_change = schedule.state_at(utc)
+        self.assertTrue(is_open)
+        self.assertEqual(Schedule.seconds_between(utc, next_change), 8 * 3600)
+
+    def test_seconds_between_across_dst(self):
+        """Test the spring-forward hour is not counted"""
+        self.assertEqual(Schedule.seconds_between(london(2024, 3, 31, 0), london(2024, 3, 31, 9)), 8 * 3600)
+
+    def test_is_open_cached_until_deadline(self):
+        """Test is_open recomputes only once the cached deadline passes"""
+        schedule = Schedule(ALWAYS, 'Europe/London')
+        with mock.patch.object(schedule_module.monotonic_clock, 'monotonic', return_value=1000.0), \
+                mock.patch.object(schedule, 'state_at', wraps=schedule.state_at) as state_at:
+            self.assertTrue(schedule.is_open())
+            self.assertTrue(schedule.is_open())
+            self.assertEqual(state_at.call_count, 1)
+        # The deadline is capped even when the next change is a day away
+        self.assertEqual(schedule._deadline, 1000.0 + MAX_CACHE_SECONDS)
+        schedule.windows = []
+        with mock.patch.object(schedule_module.monotonic_clock, 'monotonic', return_value=1000.0 + MAX_CACHE_SECONDS):
+            self.assertFalse(schedule.is_open())
+
+    def test_seconds_until_open(self):
+        """Test Retry-After is 0 when open and at least 1 when closed"""
+        self.assertEqual(Schedule(ALWAYS, 'UTC').seconds_until_open(), 0)
+        self.assertEqual(Schedule([], 'UTC').seconds_until_open(), 24 * 3600)
+
+
+class RestrictAccessByTimeMiddlewareTests(SimpleTestCase):
+    """Test the middleware applies exempt paths, rules and Retry-After"""
+
+    def middleware(self):
+        return RestrictAccessByTimeMiddleware(lambda request: HttpResponse('ok'))
+
+    def get(self, middleware, path, role=None):
+        request = RequestFactory().get(path)
+        request.user = SimpleNamespace(role=role)
+        return middleware(request)
+
+    @override_settings(ACCESS_SCHEDULE={'timezone': 'UTC', 'windows': [], 'exempt_paths': ['/health/']})
+    def test_closed_with_retry_after(self):
+        """Test closed requests get a 403 with Retry-After and exempt paths pass"""
+        middleware = self.middleware()
+        response = self.get(middleware, '/api/messages/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response['Retry-After'], str(24 * 3600))
+        self.assertEqual(self.get(middleware, '/health/').status_code, 200)
+        self.assertFalse(middleware.needs_user)
+
+    @override_settings(ACCESS_SCHEDULE={'timezone': 'UTC', 'windows': [], 'rules': [
+        {'path': '/api/public/', 'windows': ALWAYS},
+        {'path': '/api/', 'windows': []},
+        {'path': '/api/public/late/', 'windows': ALWAYS},
+    ]})
+    def test_first_matching_rule_wins(self):
+        """Test rules are tried in order and the default applies otherwise"""
+        middleware = self.middleware()
+        self.assertEqual(self.get(middleware, '/api/public/late/').status_code, 200)
+        self.assertEqual(self.get(middleware, '/api/messages/').status_code, 403)
+        self.assertEqual(self.get(middleware, '/other/').status_code, 403)
+
+    @override_settings(ACCESS_SCHEDULE={'timezone': 'UTC', 'windows': [], 'rules': [
+        {'path': '/api/', 'roles': ['admin'], 'windows': ALWAYS},
+    ]})
+    def test_role_rules(self):
+        """Test role rules only match users with one of the roles"""
+        middleware = self.middleware()
+        self.assertTrue(middleware.needs_user)
+        self.assertEqual(self.get(middleware, '/api/messages/', role='admin').status_code, 200)
+        self.assertEqual(self.get(middleware, '/api/messages/', role='guest').status_code, 403)
+        self.assertEqual(self.get(middleware, '/api/messages/').status_code, 403)
+
+
+@override_settings(ACCESS_SCHEDULE={'timezone': 'UTC', 'windows': ALWAYS, 'rules': [
+    {'path': '/api/async/', 'roles': ['guest'], 'windows': []},
+]})
+class AsyncViewTests(TestCase):
+    """Test the async views through the sync (WSGI) middleware chain"""
+    asynchronous = False
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user(username='host', email='host@example.com', password='testpass123',
+                                            role='host')
+        cls.guest = User.objects.create_user(username='guest', email='guest@example.com', password='testpass123',
+                                             role='guest')
+        cls.conversation = Conversation.objects.create()
+        cls.conversation.participants.add(cls.host, cls.guest)
+        Message.objects.create(sender=cls.guest, conversation=cls.conversation, message_body='Hello')
+
+    def get(self, path, user=None, **headers):
+        client = self.async_client if self.asynchronous else self.client
+        if user is not None:
+            client.force_login(user)
+        if self.asynchronous:
+            return async_to_sync(client.get)(path, headers=headers)
+        return client.get(path, headers=headers)
+
+    def test_unauthenticated(self):
+        """Test both views return 401 without credentials"""
+        self.assertEqual(self.get('/api/async/conversations/').status_code, 401)
+        self.assertEqual(self.get('/api/async/messages/').status_code, 401)
+
+    def test_session_user(self):
+        """Test a logged-in participant sees their conversations and messages"""
+        response = self.get('/api/async/conversations/', self.host)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['conversation_id'] for row in response.json()['results']],
+                         [str(self.conversation.pk)])
+        response = self.get(f'/api/async/messages/?conversation={self.conversation.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(response.json()['results'][0]['message_body'], 'Hello')
+        self.assertEqual(self.get('/api/async/messages/?conversation=nope').status_code, 400)
+
+    def test_jwt_user(self):
+        """Test _aauthenticate accepts a bearer token and rejects a bad one"""
+        token = str(AccessToken.for_user(self.host))
+        response = self.get('/api/async/messages/', authorization=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(self.get('/api/async/messages/', authorization='Bearer nope').status_code, 401)
+
+    def test_role_rule(self):
+        """Test the middleware resolves the session user and applies the role rule"""
+        self.assertEqual(self.get('/api/async/conversations/', self.guest).status_code, 403)
+        self.assertEqual(self.get('/api/async/messages/').status_code, 403)
+
+    def test_middleware_chain(self):
+        """Test the middleware run through __acall__ only on the async chain"""
+        with mock.patch.object(AsyncCapableMiddleware, '__acall__', autospec=True,
+                               side_effect=AsyncCapableMiddleware.__acall__) as acall:
+            self.assertEqual(self.get('/api/async/conversations/', self.host).status_code, 200)
+        self.assertEqual(acall.called, self.asynchronous)
+
+
+class AsyncChainViewTests(AsyncViewTests):
+    """Test the async views through the async (ASGI) middleware chain"""
+    asynchronous = True
+
+
+def sleepy_view(request):
+    time.sleep(0.05)
+    return HttpResponse('ok')
+
+
+@override_settings(ACCESS_SCHEDULE={'timezone': 'UTC', 'windows': ALWAYS},
+                   PROFILING_TOKEN='secret', PROFILING_SAMPLE_RATE=0.0, PROFILING_INTERVAL=0.001)
+class ProfilingTests(TestCase):
+    """Test profiling is opt-in, aggregated per route and reported to staff only"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='staff', email='staff@example.com', password='testpass123',
+                                             role='admin', is_staff=True)
+        cls.host = User.objects.create_user(username='host', email='host@example.com', password='testpass123',
+                                            role='host')
+
+    def setUp(self):
+        profile_store.clear()
+        self.addCleanup(profile_store.clear)
+
+    def test_sampler_records_stacks(self):
+        """Test the sampler sees the request thread's stack while it runs"""
+        request = RequestFactory().get('/', headers={'X-Profile': 'secret'})
+        ProfilingMiddleware(sleepy_view)(request)
+        stacks = profile_store.collapsed('GET <unresolved>')
+        self.assertIn('chats.tests:sleepy_view', stacks)
+        self.assertEqual(profile_store.summary(), {'GET <unresolved>': {'sample': 1}})
+
+    @override_settings(PROFILING_MODE='cprofile')
+    def test_report_aggregates_per_route(self):
+        """Test profiled requests add up under their route and export as pstats"""
+        self.client.force_login(self.host)
+        for _ in range(2):
+            response = self.client.get('/api/conversations/', headers={'X-Profile': 'secret'})
+            self.assertEqual(response.status_code, 200)
+        self.client.get('/api/conversations/', headers={'X-Profile': 'wrong'})
+        route = 'GET conversation-list'
+        self.assertEqual(profile_store.summary(), {route: {'cprofile': 2}})
+
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/profiling/')
+        self.assertEqual(response.json(), {route: {'cprofile': 2}})
+        response = self.client.get('/api/profiling/', {'route': route, 'export': 'pstats'})
+        self.assertEqual(response.status_code, 200)
+        filenames = {filename for filename, _, _ in marshal.loads(response.content)}
+        self.assertTrue(any(filename.endswith(os.path.join('chats', 'views.py')) for filename in filenames))
+        self.assertEqual(self.client.get('/api/profiling/', {'route': route}).status_code, 404)
+        self.assertEqual(self.client.get('/api/profiling/', {'route': route, 'export': 'svg'}).status_code, 400)
+        self.assertEqual(self.client.delete('/api/profiling/').status_code, 204)
+        self.assertEqual(profile_store.summary(), {})
+
+    def test_report_staff_only(self):
+        """Test the report refuses anonymous and non-staff users"""
+        self.assertIn(self.client.get('/api/profiling/').status_code, (401, 403))
+        self.client.force_login(self.host)
+        self.assertEqual(self.client.get('/api/profiling/').status_code, 403)
+        self.assertEqual(self.client.delete('/api/profiling/').status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/api/profiling/').status_code, 200)
+
+    @override_settings(PROFILING_TOKEN='')
+    def test_disabled_is_noop(self):
+        """Test no profiler starts without a configured token or sample rate"""
+        request = RequestFactory().get('/', headers={'X-Profile': ''})
+        with mock.patch.object(middleware_module, 'start_profiler') as start_profiler:
+            response = ProfilingMiddleware(lambda request: HttpResponse('ok'))(request)
+        self.assertEqual(response.content, b'ok')
+        start_profiler.assert_not_called()
+        self.assertEqual(profile_store.summary(), {})
@@ -1,7 +1,13 @@
 from django.urls import path, include
 from rest_framework_nested import routers
 
-from .views import ConversationViewSet, MessageViewSet 
+from .views import (
+    ConversationViewSet,
+    MessageViewSet,
+    ProfilingReportView,
+    async_conversation_list,
+    async_message_list,
+)
 
 # Create a router and register our ViewSets with it.
 router = routers.SimpleRouter()
@@ -14,6 +20,9 @@ nested_router.register(r'messages', MessageViewSet, basename='conversation-messa
 
 # The API URLs are now determined automatically by the router.
 urlpatterns = [
+    path('async/conversations/', async_conversation_list, name='async-conversation-list'),
+    path('async/messages/', async_message_list, name='async-message-list'),
+    path('profiling/', ProfilingReportView.as_view(), name='profiling-report'),
     path('', include(router.urls)),
     path('', include(nested_router.urls)),
 ]
@@ -1,3 +1,5 @@
+import uuid
+
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
@@ -11,6 +13,19 @@ from .permissions import IsParticipantOfConversation, IsOwnerOrReadOnly
 from rest_framework.permissions import IsAuthenticated
 
 from .pagination import MessageResultsSetPagination
+from .profiling import profile_store
+
+from django.db import models
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.fields import DateTimeField
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
 class ConversationViewSet(viewsets.ModelViewSet):
     queryset = Conversation.objects.all()
@@ -75,4 +90,160 @@ class MessageViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """Automatically set the sender to the current user when creating a message."""
-        serializer.save(sender=self.request.user)
\ No newline at end of file
+        serializer.save(sender=self.request.user)
+
+
+class ProfilingReportView(APIView):
+    """
+    Profiles collected by ProfilingMiddleware, for admins.
+
+    GET lists profiled request counts per route. GET with ?route=<route>
+    downloads that route's data: &export=collapsed (default) for sampled
+    stacks in flamegraph format, or &export=pstats for cProfile data.
+    (``format`` is taken by DRF's content negotiation.) DELETE discards
+    everything collected so far.
+    """
+    permission_classes = [IsAdminUser]
+    formats = {
+        'collapsed': (profile_store.collapsed, 'text/plain; charset=utf-8', 'txt'),
+        'pstats': (profile_store.pstats_dump, 'application/octet-stream', 'pstats'),
+    }
+
+    def get(self, request):
+        route = request.query_params.get('route')
+        if route is None:
+            return Response(profile_store.summary())
+        output_format = request.query_params.get('export', 'collapsed')
+        if output_format not in self.formats:
+            raise ValidationError({'export': [f"Must be one of: {', '.join(self.formats)}."]})
+        export, content_type, extension = self.formats[output_format]
+        data = export(route)
+        if data is None:
+            raise NotFound(f"No {output_format} data for route {route!r}.")
+        response = HttpResponse(data, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="profile.{extension}"'
+        return response
+
+    def delete(self, request):
+        profile_store.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# Async read endpoints. These run on the event loop under ASGI using the
+# async ORM, so slow clients do not each hold a worker thread. They return
+# the same shapes as the viewsets' list actions.
+
+_datetime = DateTimeField().to_representation
+
+
+async def _aauthenticate(request):
+    """Resolve the user from a JWT bearer token or the session, without thread hops."""
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header is not None else None
+    if raw_token is not None:
+        try:
+            token = auth.get_validated_token(raw_token)
+            return await User.objects.aget(
+                is_active=True, **{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]})
+        except (InvalidToken, KeyError, User.DoesNotExist):
+            return None
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def _page_bounds(request):
+    """Return (page, page_size) from the query string, like MessageResultsSetPagination."""
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    try:
+        page_size = min(max(int(request.GET.get('page_size', 20)), 1), 100)
+    except ValueError:
+        page_size = 20
+    return page, page_size
+
+
+def _paginated(request, count, page, page_size, results):
+    url = request.build_absolute_uri()
+    next_link = replace_query_param(url, 'page', page + 1) if page * page_size < count else None
+    if page == 1:
+        previous_link = None
+    elif page == 2:
+        previous_link = remove_query_param(url, 'page')
+    else:
+        previous_link = replace_query_param(url, 'page', page - 1)
+    return {'count': count, 'next': next_link, 'previous': previous_link, 'results': results}
+
+
+def _message_dict(row):
+    return {
+        'message_id': str(row['message_id']),
+        'sender': str(row['sender_id']),
+        'conversation': str(row['conversation_id']),
+        'message_body': row['message_body'],
+        'sent_at': _datetime(row['sent_at']),
+    }
+
+
+_MESSAGE_COLUMNS = ('message_id', 'sender_id', 'conversation_id', 'message_body', 'sent_at')
+
+
+@require_GET
+async def async_conversation_list(request):
+    """Conversations the user participates in, newest first."""
+    user = await _aauthenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    page, page_size = _page_bounds(request)
+    queryset = Conversation.objects.filter(participants=user).order_by('-created_at')
+    count = await queryset.acount()
+    offset = (page - 1) * page_size
+    rows = [row async for row in queryset.values('conversation_id', 'created_at')[offset:offset + page_size]]
+    ids = [row['conversation_id'] for row in rows]
+
+    participants = {conversation_id: [] for conversation_id in ids}
+    memberships = Conversation.participants.through.objects.filter(conversation_id__in=ids)
+    async for conversation_id, user_id in memberships.values_list('conversation_id', 'user_id'):
+        participants[conversation_id].append(str(user_id))
+
+    messages = {conversation_id: [] for conversation_id in ids}
+    async for row in Message.objects.filter(conversation_id__in=ids).values(*_MESSAGE_COLUMNS):
+        messages[row['conversation_id']].append(_message_dict(row))
+
+    results = [
+        {
+            'conversation_id': str(row['conversation_id']),
+            'participants': participants[row['conversation_id']],
+            'messages': messages[row['conversation_id']],
+            'created_at': _datetime(row['created_at']),
+        }
+        for row in rows
+    ]
+    return JsonResponse(_paginated(request, count, page, page_size, results))
+
+
+@require_GET
+async def async_message_list(request):
+    """Messages the user sent or can see as a participant, newest first."""
+    user = await _aauthenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    page, page_size = _page_bounds(request)
+    queryset = Message.objects.filter(
+        models.Q(sender=user) |
+        models.Q(conversation__participants=user)).distinct().order_by('-sent_at')
+    conversation_id = request.GET.get('conversation')
+    if conversation_id:
+        try:
+            conversation_id = uuid.UUID(conversation_id)
+        except ValueError:
+            return JsonResponse({'conversation': ['Must be a valid UUID.']}, status=400)
+        queryset = queryset.filter(conversation_id=conversation_id)
+    count = await queryset.acount()
+    offset = (page - 1) * page_size
+    results = [_message_dict(row) async for row in queryset.values(*_MESSAGE_COLUMNS)[offset:offset + page_size]]
+    return JsonResponse(_paginated(request, count, page, page_size, results))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     'chats.middleware.RestrictAccessByTimeMiddleware',
     'chats.middleware.OffensiveLanguageMiddleware',
     'chats.middleware.RolePermissionMiddleware',
+    'chats.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'messaging_app.urls'
@@ -148,3 +150,24 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# User's primary key is user_id; there is no id column for tokens to carry
+SIMPLE_JWT = {
+    'USER_ID_FIELD': 'user_id',
+}
+
+# Opening hours enforced by RestrictAccessByTimeMiddleware; see its
+# docstring for per-route, per-role and per-timezone rules
+ACCESS_SCHEDULE = {
+    'timezone': TIME_ZONE,
+    'windows': [('09:00', '18:00')],
+    'exempt_paths': ['/health/', '/static/'],
+    'rules': [],
+}
+
+# ProfilingMiddleware: requests with an X-Profile header equal to
+# PROFILING_TOKEN are always profiled, others with probability
+# PROFILING_SAMPLE_RATE. PROFILING_MODE is 'sample' or 'cprofile'.
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_MODE = 'sample'
+PROFILING_INTERVAL = 0.005
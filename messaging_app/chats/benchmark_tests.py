@@ -0,0 +1,141 @@
+"""
+Benchmarks for the chats API hot paths.
+
+Deselected by default (see pytest.ini); run them with
+
+    pytest -m benchmark
+
+Each benchmark records its query count and median latency, after a few
+warm-up requests (BENCHMARK_WARMUP_ROUNDS), and compares them with
+benchmark_baseline.json. A run fails when a benchmark issues more
+queries than its baseline or is slower than the baseline by more than
+BENCHMARK_TOLERANCE (default 0.5, i.e. 50%). Set BENCHMARK_UPDATE_BASELINE=1
+to rewrite the baseline from the current run.
+"""
+import json
+import os
+import statistics
+import time
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import Conversation, Message, User
+
+pytestmark = [pytest.mark.benchmark, pytest.mark.django_db]
+
+BASELINE_FILE = Path(__file__).with_name('benchmark_baseline.json')
+TOLERANCE = float(os.environ.get('BENCHMARK_TOLERANCE', '0.5'))
+UPDATE_BASELINE = os.environ.get('BENCHMARK_UPDATE_BASELINE') == '1'
+ROUNDS = int(os.environ.get('BENCHMARK_ROUNDS', '25'))
+WARMUP_ROUNDS = int(os.environ.get('BENCHMARK_WARMUP_ROUNDS', '3'))
+
+DATASETS = {
+    'small': {'users': 50, 'conversations': 20, 'messages': 1_000},
+    'medium': {'users': 300, 'conversations': 150, 'messages': 10_000},
+}
+
+_results = {}
+
+
+@pytest.fixture(scope='module', params=list(DATASETS))
+def dataset(request, django_db_setup, django_db_blocker):
+    """Seed one dataset size for the module and remove it afterwards."""
+    with django_db_blocker.unblock():
+        call_command('generate_load_data', seed=1, min_participants=2, max_participants=10,
+                     stdout=StringIO(), **DATASETS[request.param])
+        # Ties broken by key, which the seed fixes, so every run measures the same user
+        user = User.objects.annotate(n=Count('conversations')).order_by('-n', 'pk').first()
+        yield request.param, user
+        Message.objects.all().delete()
+        Conversation.objects.all().delete()
+        User.objects.all().delete()
+
+
+@pytest.fixture
+def conversation(dataset):
+    """The user's busiest conversation, chosen the same way on every run."""
+    _, user = dataset
+    return user.conversations.annotate(n=Count('messages')).order_by('-n', 'pk').first()
+
+
+@pytest.fixture
+def api_client(dataset):
+    _, user = dataset
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def run_benchmark(name, dataset, func):
+    """Time `func` over ROUNDS runs after WARMUP_ROUNDS, count its queries and record the median."""
+    response = func()
+    assert response.status_code < 400, (name, response.status_code, getattr(response, 'data', None))
+    for _ in range(WARMUP_ROUNDS):  # warm up caches and lazy imports
+        func()
+    with CaptureQueriesContext(connection) as queries:
+        func()
+    query_count = len(queries)  # read now; later requests reset the query log
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    key = f'{name}[{dataset[0]}]'
+    result = {'queries': query_count, 'median_ms': round(statistics.median(timings) * 1000, 3)}
+    _results[key] = result
+    check_baseline(key, result)
+
+
+def check_baseline(key, result):
+    if UPDATE_BASELINE or not BASELINE_FILE.exists():
+        return
+    baseline = json.loads(BASELINE_FILE.read_text()).get(key)
+    if baseline is None:
+        return
+    assert result['queries'] <= baseline['queries'], (
+        f"{key}: {result['queries']} queries, baseline {baseline['queries']}")
+    limit = baseline['median_ms'] * (1 + TOLERANCE)
+    assert result['median_ms'] <= limit, (
+        f"{key}: {result['median_ms']}ms, baseline {baseline['median_ms']}ms (limit {limit:.3f}ms)")
+
+
+@pytest.fixture(scope='session', autouse=True)
+def write_baseline():
+    yield
+    if UPDATE_BASELINE and _results:
+        baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+        baseline.update(_results)
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+
+
+def test_conversation_list(dataset, api_client):
+    run_benchmark('conversation_list', dataset, lambda: api_client.get('/api/conversations/'))
+
+
+def test_message_list_first_page(dataset, api_client):
+    run_benchmark('message_list_first_page', dataset, lambda: api_client.get('/api/messages/'))
+
+
+def test_message_list_deep_page(dataset, api_client):
+    pages = api_client.get('/api/messages/').data['count'] // 20
+    run_benchmark('message_list_deep_page', dataset, lambda: api_client.get(f'/api/messages/?page={max(pages, 1)}'))
+
+
+def test_message_search(dataset, api_client):
+    run_benchmark('message_search', dataset, lambda: api_client.get('/api/messages/?search=message 12'))
+
+
+def test_message_create(dataset, api_client, conversation):
+    run_benchmark('message_create', dataset, lambda: api_client.post(
+        '/api/messages/', {'conversation': str(conversation.pk), 'message_body': 'benchmark'}, format='json'))
+
+
+def test_conversation_permission_check(dataset, api_client, conversation):
+    run_benchmark('conversation_detail', dataset, lambda: api_client.get(f'/api/conversations/{conversation.pk}/'))
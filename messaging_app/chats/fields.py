@@ -0,0 +1,63 @@
+import os
+import time
+import uuid
+
+from django.db import models
+
+
+def uuid7(millis=None, random_bits=None):
+    """
+    Time-ordered UUID (RFC 9562 version 7): 48-bit Unix milliseconds, then
+    random bits. Keys generated later sort later, so inserts append to the
+    right edge of the index instead of landing on random pages. ``millis``
+    and the 80 ``random_bits`` default to now and os.urandom; pass them to
+    get reproducible keys.
+    """
+    if millis is None:
+        millis = time.time_ns() // 1_000_000
+    if random_bits is None:
+        random_bits = int.from_bytes(os.urandom(10), 'big')
+    value = millis << 80 | random_bits
+    value = value & ~(0xF << 76) | 7 << 76      # version
+    value = value & ~(0x3 << 62) | 0x2 << 62    # variant
+    return uuid.UUID(int=value)
+
+
+class CompactUUIDField(models.UUIDField):
+    """
+    UUIDField stored as 16 raw bytes where the database has no native UUID
+    type: BLOB on SQLite and BINARY(16) on MySQL, instead of the 32-character
+    text Django uses there. PostgreSQL keeps its native uuid column. Foreign
+    keys to the field get the same column type.
+    """
+
+    def get_internal_type(self):
+        # Not 'UUIDField': the SQLite and MySQL backends would run their own
+        # text-to-UUID converter on the bytes before from_db_value sees them
+        return 'CompactUUIDField'
+
+    def db_type(self, connection):
+        if connection.vendor == 'sqlite':
+            return 'blob'
+        if connection.vendor == 'mysql':
+            return 'binary(16)'
+        return connection.data_types['UUIDField'] % self.db_type_parameters(connection)
+
+    def rel_db_type(self, connection):
+        return self.db_type(connection)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if connection.vendor not in ('sqlite', 'mysql'):
+            return super().get_db_prep_value(value, connection, prepared)
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = self.to_python(value)
+        return value.bytes
+
+    def from_db_value(self, value, expression, connection):
+        if isinstance(value, (bytes, memoryview)):
+            return uuid.UUID(bytes=bytes(value))
+        if isinstance(value, str):
+            return uuid.UUID(value)
+        return value
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from chats.models import Conversation, Message, User
+from chats.renderers import MessagePackRenderer
+from chats.serializers import FastMessageSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON and MessagePack encode time and size for message pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', type=int, nargs='+', default=[20, 100])
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        renderers = [('json', JSONRenderer()), ('msgpack', MessagePackRenderer())]
+
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark-user', email='benchmark@example.com', role='guest')
+            conversation = Conversation.objects.create()
+            conversation.participants.add(user)
+            Message.objects.bulk_create(
+                Message(sender=user, conversation=conversation, message_body=f'Benchmark message {i}')
+                for i in range(max(options['page_sizes']))
+            )
+            rows = list(Message.objects.filter(conversation=conversation).values_list(
+                *FastMessageSerializer.columns_for()))
+            transaction.set_rollback(True)
+
+        for page_size in options['page_sizes']:
+            page = {'count': page_size, 'next': None, 'previous': None,
+                    'results': FastMessageSerializer(rows[:page_size]).data}
+            for name, renderer in renderers:
+                best = float('inf')
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    body = renderer.render(page)
+                    best = min(best, time.perf_counter() - start)
+                self.stdout.write(
+                    f'page_size={page_size:<4} {name:<8} {best * 1000:7.3f} ms  '
+                    f'{len(body):7d} bytes  {len(body) / page_size:6.1f} bytes/message'
+                )
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from chats.models import Conversation, Message, User
+from chats.serializers import FastMessageSerializer, MessageSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare MessageSerializer with FastMessageSerializer on a temporary message set.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        repeat = options['repeat']
+        renderer = JSONRenderer()
+
+        with transaction.atomic():
+            user = User.objects.create(username='benchmark-user', email='benchmark@example.com', role='guest')
+            conversation = Conversation.objects.create()
+            conversation.participants.add(user)
+            Message.objects.bulk_create(
+                Message(sender=user, conversation=conversation, message_body=f'Benchmark message {i}')
+                for i in range(count)
+            )
+            queryset = Message.objects.filter(conversation=conversation)
+
+            def drf():
+                return renderer.render(MessageSerializer(list(queryset), many=True).data)
+
+            def fast():
+                return renderer.render(FastMessageSerializer(queryset.values_list(*FastMessageSerializer.columns_for())).data)
+
+            assert drf() == fast()
+            slow_time = self.measure(drf, repeat)
+            fast_time = self.measure(fast, repeat)
+            transaction.set_rollback(True)
+
+        per_thousand = 1000 / count
+        self.stdout.write(f'MessageSerializer      {slow_time * per_thousand * 1000:8.2f} ms per 1000 messages')
+        self.stdout.write(f'FastMessageSerializer  {fast_time * per_thousand * 1000:8.2f} ms per 1000 messages')
+        self.stdout.write(f'Saved                  {(slow_time - fast_time) * per_thousand * 1000:8.2f} ms per 1000 messages')
+
+    def measure(self, func, repeat):
+        """Return the best wall time of `repeat` runs."""
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        return best
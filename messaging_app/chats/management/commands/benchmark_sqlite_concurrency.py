@@ -0,0 +1,118 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter against a scratch database: client threads send
+# a mix of message POSTs and message list GETs through the full request stack
+# for a fixed time, then the counts and latencies are printed as JSON.
+LOAD_SCRIPT = """
+import json, random, sys, threading, time
+options = json.loads(sys.argv[1])
+from django.conf import settings
+settings.DATABASES['default']['NAME'] = options['database']
+import django
+django.setup()
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test.utils import setup_test_environment
+from rest_framework.test import APIClient
+from chats.models import Conversation, User
+
+setup_test_environment()
+call_command('migrate', verbosity=0)
+users = [User.objects.create(username=f'load{i}', email=f'load{i}@example.com', role='guest')
+         for i in range(options['threads'])]
+conversation = Conversation.objects.create()
+conversation.participants.add(*users)
+with connection.cursor() as cursor:
+    cursor.execute('PRAGMA journal_mode')
+    journal_mode = cursor.fetchone()[0]
+connections.close_all()
+
+messages_url = f'/api/conversations/{conversation.pk}/messages/'
+results = []
+start = threading.Barrier(options['threads'])
+
+def client(index):
+    api = APIClient(raise_request_exception=False)
+    api.force_authenticate(users[index])
+    rng = random.Random(index)
+    writes, reads, errors = [], [], 0
+    start.wait()
+    stop = time.monotonic() + options['duration']
+    while time.monotonic() < stop:
+        began = time.perf_counter()
+        if rng.random() < options['read_ratio']:
+            response, latencies = api.get(messages_url), reads
+        else:
+            response, latencies = api.post('/api/messages/', {
+                'conversation': str(conversation.pk), 'message_body': 'load test'}, format='json'), writes
+        if response.status_code >= 400:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - began)
+    connection.close()
+    results.append((writes, reads, errors))
+
+threads = [threading.Thread(target=client, args=(i,)) for i in range(options['threads'])]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+writes = sorted(latency for result in results for latency in result[0])
+reads = sorted(latency for result in results for latency in result[1])
+print(json.dumps({'journal_mode': journal_mode, 'writes': writes, 'reads': reads,
+                  'errors': sum(result[2] for result in results)}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Measure requests per second of concurrent message POSTs and GETs on SQLite, per settings module.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('settings_modules', nargs='*',
+                            help='Settings modules to compare (default: messaging_app.settings_api '
+                                 'and messaging_app.settings_sqlite).')
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients.')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds of load per settings module.')
+        parser.add_argument('--read-ratio', type=float, default=0.5, help='Share of requests that are GETs.')
+
+    def handle(self, *args, **options):
+        modules = options['settings_modules'] or ['messaging_app.settings_api', 'messaging_app.settings_sqlite']
+        for module in modules:
+            self.report(module, self.measure(module, options), options['duration'])
+
+    def measure(self, module, options):
+        with tempfile.TemporaryDirectory() as directory:
+            load = {
+                'database': os.path.join(directory, 'load.sqlite3'),
+                'threads': options['threads'],
+                'duration': options['duration'],
+                'read_ratio': options['read_ratio'],
+            }
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE=module)
+            completed = subprocess.run(
+                [sys.executable, '-c', LOAD_SCRIPT, json.dumps(load)],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+            )
+        if completed.returncode != 0:
+            raise CommandError(f'{module} failed under load:\n{completed.stderr[-2000:]}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def report(self, module, result, duration):
+        writes, reads = result['writes'], result['reads']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{module}: {(len(writes) + len(reads)) / duration:.0f} requests/s, '
+            f'{result["errors"]} errors, journal_mode={result["journal_mode"]}'
+        ))
+        for name, latencies in (('POST', writes), ('GET', reads)):
+            if not latencies:
+                continue
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[min(len(latencies) * 99 // 100, len(latencies) - 1)] * 1000
+            self.stdout.write(f'  {name:<5} {len(latencies) / duration:8.0f} /s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms')
@@ -0,0 +1,102 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from chats.fields import uuid7
+
+# Shaped like chats_message: key, two foreign keys and the (conversation, sent_at) index
+SCHEMA = """
+CREATE TABLE message (message_id {key} PRIMARY KEY, sender_id {key}, conversation_id {key},
+                      message_body text, sent_at real);
+CREATE INDEX message_conversation_sent_at ON message (conversation_id, sent_at);
+"""
+
+LAYOUTS = [
+    # name, column type, key generator, stored form
+    ('uuid4 char(32)', 'char(32)', uuid.uuid4, lambda key: key.hex),
+    ('uuid4 blob(16)', 'blob', uuid.uuid4, lambda key: key.bytes),
+    ('uuid7 blob(16)', 'blob', uuid7, lambda key: key.bytes),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare text uuid4 keys with time-ordered 16-byte keys: insert rate, index size, scan and lookup time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per insert transaction.')
+        parser.add_argument('--lookups', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, column_type, generate, store in LAYOUTS:
+                path = os.path.join(directory, name.replace(' ', '_') + '.sqlite3')
+                self.run_layout(name, path, column_type, generate, store, options)
+
+    def run_layout(self, name, path, column_type, generate, store, options):
+        rng = random.Random(options['seed'])
+        db = sqlite3.connect(path, isolation_level=None)
+        db.executescript(SCHEMA.format(key=column_type))
+        users = [store(generate()) for _ in range(500)]
+        conversations = [store(generate()) for _ in range(1000)]
+
+        keys = []
+        elapsed = 0.0
+        for offset in range(0, options['rows'], options['batch_size']):
+            count = min(options['batch_size'], options['rows'] - offset)
+            batch = [(store(generate()), rng.choice(users), rng.choice(conversations), 'x' * 40, time.time())
+                     for _ in range(count)]
+            keys.extend(row[0] for row in batch)
+            start = time.perf_counter()
+            db.execute('BEGIN')
+            db.executemany('INSERT INTO message VALUES (?, ?, ?, ?, ?)', batch)
+            db.execute('COMMIT')
+            elapsed += time.perf_counter() - start
+        db.execute('ANALYZE')
+
+        sizes = self.sizes(db)
+        db.close()
+
+        # Fresh connection so SQLite's page cache starts empty
+        db = sqlite3.connect(path)
+        ordered = sorted(keys)
+        low, high = ordered[len(ordered) // 2], ordered[len(ordered) // 2 + len(ordered) // 10]
+        start = time.perf_counter()
+        scanned = db.execute(
+            'SELECT message_id, sender_id FROM message WHERE message_id >= ? AND message_id < ?', (low, high)
+        ).fetchall()
+        scan = time.perf_counter() - start
+
+        sample = rng.sample(keys, min(options['lookups'], len(keys)))
+        start = time.perf_counter()
+        for key in sample:
+            db.execute('SELECT message_body FROM message WHERE message_id = ?', (key,)).fetchone()
+        lookup = time.perf_counter() - start
+        db.close()
+
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        self.stdout.write(f'  insert       {options["rows"] / elapsed:10.0f} rows/s')
+        for label, size in sizes:
+            self.stdout.write(f'  {label:<12} {size / 1024 / 1024:10.2f} MiB')
+        self.stdout.write(f'  range scan   {scan * 1000:10.2f} ms for {len(scanned)} rows')
+        self.stdout.write(f'  lookups      {lookup / len(sample) * 1e6:10.2f} us each')
+
+    def sizes(self, db):
+        """Bytes per B-tree: table, primary key index and secondary index."""
+        try:
+            rows = dict(db.execute('SELECT name, SUM(pgsize) FROM dbstat GROUP BY name'))
+        except sqlite3.OperationalError:
+            # SQLite built without the dbstat virtual table: whole file only
+            page_size = db.execute('PRAGMA page_size').fetchone()[0]
+            return [('file', db.execute('PRAGMA page_count').fetchone()[0] * page_size)]
+        return [
+            ('table', rows.get('message', 0)),
+            ('primary key', rows.get('sqlite_autoindex_message_1', 0)),
+            ('index', rows.get('message_conversation_sent_at', 0)),
+        ]
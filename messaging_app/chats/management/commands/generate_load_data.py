@@ -0,0 +1,204 @@
+import itertools
+import multiprocessing
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from chats.fields import uuid7
+from chats.models import Conversation, Message, User
+
+# Shared with forked message workers; set by Command.create_messages
+_STATE = {}
+
+
+def seeded_uuid7(rng, millis):
+    """Time-ordered key like the models' default, with random bits from ``rng``."""
+    return uuid7(millis, rng.getrandbits(80))
+
+
+def to_millis(when):
+    return int(when.timestamp() * 1000)
+
+
+def insert_as_given(messages):
+    """
+    INSERT messages with their field values as set. Unlike bulk_create this
+    skips pre_save, so auto_now_add does not replace the generated sent_at.
+    """
+    fields = Message._meta.concrete_fields
+    quote = connection.ops.quote_name
+    sql = (f'INSERT INTO {quote(Message._meta.db_table)} ({", ".join(quote(field.column) for field in fields)}) '
+           f'VALUES ({", ".join(["%s"] * len(fields))})')
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(getattr(message, field.attname), connection) for field in fields]
+            for message in messages
+        ])
+
+
+def _insert_messages(job):
+    """Create `count` messages; runs in the main process or a forked worker."""
+    count, seed = job
+    rng = random.Random(seed)
+    conversations = _STATE['conversations']
+    participants = _STATE['participants']
+    cum_weights = _STATE['cum_weights']
+    now = _STATE['now']
+    seconds = _STATE['days'] * 86400
+    skew = _STATE['time_skew']
+    batch_size = _STATE['batch_size']
+
+    # random() ** skew > 1 bunches messages towards now. Sorted, so messages
+    # are inserted oldest first and keys append as they do in production
+    sent_at = sorted(now - timedelta(seconds=seconds * rng.random() ** skew) for _ in range(count))
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        picked = rng.choices(range(len(conversations)), cum_weights=cum_weights, k=size)
+        batch = [
+            Message(
+                message_id=seeded_uuid7(rng, to_millis(sent_at[created + n])),
+                conversation_id=conversations[i],
+                sender_id=rng.choice(participants[i]),
+                message_body=f'Load message {created + n}',
+                sent_at=sent_at[created + n],
+            )
+            for n, i in enumerate(picked)
+        ]
+        with transaction.atomic():
+            insert_as_given(batch)
+        created += size
+    return created
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, conversations and messages for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--conversations', type=int, default=5_000)
+        parser.add_argument('--messages', type=int, default=100_000)
+        parser.add_argument(
+            '--participants', choices=['fixed', 'uniform', 'pareto'], default='pareto',
+            help='Participants per conversation: always --min-participants, uniform between min and max, '
+                 'or pareto (mostly small, a few large groups).'
+        )
+        parser.add_argument('--min-participants', type=int, default=2)
+        parser.add_argument('--max-participants', type=int, default=50)
+        parser.add_argument('--days', type=int, default=365, help='Spread messages over this many past days.')
+        parser.add_argument('--time-skew', type=float, default=3.0,
+                            help='Values above 1 concentrate messages in recent days.')
+        parser.add_argument('--activity-skew', type=float, default=1.2,
+                            help='Zipf exponent for how messages spread across conversations; 0 is uniform.')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes inserting messages. SQLite always uses 1.')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['min_participants'] < 1 or options['max_participants'] < options['min_participants']:
+            raise CommandError('Need 1 <= --min-participants <= --max-participants.')
+        if options['users'] < options['max_participants']:
+            raise CommandError('--users must be at least --max-participants.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.run_id = uuid.uuid4().hex[:8]
+        # Users and conversations are keyed from this plus their index, so the
+        # key order depends on the seed alone while reruns still get new keys
+        self.key_epoch = to_millis(timezone.now())
+
+        start = time.perf_counter()
+        user_ids = self.create_users(options['users'])
+        self.log(f'{len(user_ids)} users', start)
+
+        conversations, participants = self.create_conversations(options, user_ids)
+        self.log(f'{len(conversations)} conversations', start)
+
+        created = self.create_messages(options, conversations, participants)
+        self.log(f'{created} messages', start)
+
+    def log(self, what, start):
+        self.stdout.write(f'{time.perf_counter() - start:8.1f}s  created {what}')
+
+    def create_users(self, count):
+        roles = [role for role, _ in User.ROLE_CHOICES]
+        user_ids = []
+        for offset in range(0, count, self.batch_size):
+            batch = [
+                User(
+                    user_id=seeded_uuid7(self.rng, self.key_epoch + i),
+                    username=f'load_{self.run_id}_{i}',
+                    email=f'load_{self.run_id}_{i}@example.com',
+                    first_name='Load',
+                    last_name=str(i),
+                    role=self.rng.choice(roles),
+                    password='!',
+                )
+                for i in range(offset, min(offset + self.batch_size, count))
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(batch, batch_size=self.batch_size)
+            user_ids.extend(user.user_id for user in batch)
+        return user_ids
+
+    def participant_count(self, options):
+        low, high = options['min_participants'], options['max_participants']
+        if options['participants'] == 'fixed':
+            return low
+        if options['participants'] == 'uniform':
+            return self.rng.randint(low, high)
+        return min(high, int(low * self.rng.paretovariate(1.5)))
+
+    def create_conversations(self, options, user_ids):
+        Membership = Conversation.participants.through
+        conversations = []
+        participants = []
+        for offset in range(0, options['conversations'], self.batch_size):
+            size = min(self.batch_size, options['conversations'] - offset)
+            batch = [Conversation(conversation_id=seeded_uuid7(self.rng, self.key_epoch + i))
+                     for i in range(offset, offset + size)]
+            members = [self.rng.sample(user_ids, self.participant_count(options)) for _ in batch]
+            with transaction.atomic():
+                Conversation.objects.bulk_create(batch, batch_size=self.batch_size)
+                Membership.objects.bulk_create(
+                    [Membership(conversation_id=conversation.conversation_id, user_id=user_id)
+                     for conversation, users in zip(batch, members) for user_id in users],
+                    batch_size=self.batch_size
+                )
+            conversations.extend(conversation.conversation_id for conversation in batch)
+            participants.extend(members)
+        return conversations, participants
+
+    def create_messages(self, options, conversations, participants):
+        weights = [1 / (rank ** options['activity_skew']) for rank in range(1, len(conversations) + 1)]
+        self.rng.shuffle(weights)
+        _STATE.update(
+            conversations=conversations,
+            participants=participants,
+            cum_weights=list(itertools.accumulate(weights)),
+            now=timezone.now(),
+            days=options['days'],
+            time_skew=options['time_skew'],
+            batch_size=self.batch_size,
+        )
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stderr.write('SQLite allows one writer at a time; using --workers 1.')
+            workers = 1
+
+        total = options['messages']
+        shares = [total // workers + (1 if i < total % workers else 0) for i in range(workers)]
+        jobs = [(share, self.rng.getrandbits(64)) for share in shares if share]
+        if workers == 1:
+            return sum(_insert_messages(job) for job in jobs)
+
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            return sum(pool.map(_insert_messages, jobs))
@@ -0,0 +1,81 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: boot the WSGI app and import every view, as a
+# worker does before serving its first request, then report time and memory.
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+seconds = time.perf_counter() - start
+rss_kb = None
+try:
+    with open('/proc/self/status') as status:
+        rss_kb = next(int(line.split()[1]) for line in status if line.startswith('VmRSS:'))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == 'darwin' else 1)
+print(json.dumps({'seconds': seconds, 'rss_kb': rss_kb, 'modules': len(sys.modules)}))
+"""
+
+
+class Command(BaseCommand):
+    help = 'Report cold start import time per module and resident memory of a worker, per settings module.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('settings_modules', nargs='*',
+                            help='Settings modules to compare (default: the current one).')
+        parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters started per settings module.')
+        parser.add_argument('--top', type=int, default=15, help='Slowest imports to list.')
+        parser.add_argument('--by', choices=['package', 'module'], default='package',
+                            help='Group import time by top-level package or by module.')
+
+    def handle(self, *args, **options):
+        modules = options['settings_modules'] or [os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)]
+        for module in modules:
+            results = [self.measure(module, options['by']) for _ in range(options['runs'])]
+            self.report(module, results, options['top'])
+
+    def measure(self, module, by):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=module, PYTHONDONTWRITEBYTECODE='1')
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            raise CommandError(f'{module} failed to start:\n{completed.stderr[-2000:]}')
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+        # -X importtime lines: "import time: <self us> | <cumulative us> | <indented name>"
+        self_us = Counter()
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            own, _, name = line[len('import time:'):].split('|')
+            name = name.strip()
+            self_us[name.split('.')[0] if by == 'package' else name] += int(own)
+        result['imports'] = self_us
+        return result
+
+    def report(self, module, results, top):
+        seconds = statistics.median(result['seconds'] for result in results)
+        rss_mib = statistics.median(result['rss_kb'] for result in results) / 1024
+        modules = results[0]['modules']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{module}: {seconds * 1000:.0f} ms to first request, {rss_mib:.1f} MiB RSS, {modules} modules'
+        ))
+        totals = Counter()
+        for result in results:
+            totals.update(result['imports'])
+        self.stdout.write(f'  {"self ms":>8}  import')
+        for name, total in totals.most_common(top):
+            self.stdout.write(f'  {total / len(results) / 1000:8.1f}  {name}')
@@ -0,0 +1,57 @@
+import threading
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from chats.queue import claim, run_claimed
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (see chats.queue) with a pool of worker threads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=100, help='Tasks claimed per round by each thread.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Drain the due tasks and exit.')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stop = threading.Event()
+        if options['threads'] == 1:
+            try:
+                self.work()
+            except KeyboardInterrupt:
+                pass
+            return
+        threads = [threading.Thread(target=self.work_in_thread, daemon=True) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+    def work_in_thread(self):
+        try:
+            self.work()
+        finally:
+            connection.close()
+
+    def work(self):
+        worker_id = uuid.uuid4().hex
+        while not self.stop.is_set():
+            tasks = claim(worker_id, self.options['batch_size'])
+            if tasks:
+                done = run_claimed(tasks)
+                self.stdout.write(f'{worker_id[:8]}: {done}/{len(tasks)} tasks succeeded')
+            elif self.options['once']:
+                break
+            else:
+                self.stop.wait(self.options['poll_interval'])
@@ -0,0 +1,172 @@
+"""
+Per-user cache of conversation memberships.
+
+Access checks need the set of conversations a user takes part in. Instead of
+joining the participants table on every query, the set is kept in a small
+per-process LRU backed by Django's cache. Each user has a version number in
+the shared cache; bumping it (see ``invalidate``) makes every process drop its
+local copy on the next lookup.
+
+That only holds when the cache backend is shared between processes (see
+CACHES in settings). With a local-memory or dummy backend another gunicorn
+worker would never see the bump and would keep granting a removed
+participant access, so lookups go straight to the database instead.
+"""
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import Q, Subquery
+
+from .models import Conversation
+
+Membership = Conversation.participants.through
+
+
+class MembershipCache:
+    """Conversation id sets per user, local LRU in front of Django's cache."""
+
+    key_prefix = 'chats:membership'
+
+    def __init__(self):
+        self._local = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def max_users(self):
+        return getattr(settings, 'MEMBERSHIP_CACHE_SIZE', 1024)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'MEMBERSHIP_CACHE_TTL', 300)
+
+    @property
+    def shared(self):
+        """Whether invalidations reach every process through the cache backend."""
+        return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+    def version_key(self, user_id):
+        return f'{self.key_prefix}:version:{user_id}'
+
+    def ids_key(self, user_id, version):
+        return f'{self.key_prefix}:ids:{user_id}:{version}'
+
+    def conversation_ids(self, user_id):
+        """Return the frozenset of conversation ids ``user_id`` participates in."""
+        if not self.shared:
+            return self.load(user_id)
+        version = cache.get(self.version_key(user_id), 0)
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is not None and entry[0] == version and entry[2] > time.monotonic():
+                self._local.move_to_end(user_id)
+                return entry[1]
+
+        ids = cache.get(self.ids_key(user_id, version))
+        if ids is None:
+            ids = self.load(user_id)
+            cache.set(self.ids_key(user_id, version), ids, self.timeout)
+
+        with self._lock:
+            # Local copies also expire, in case the version key is evicted
+            self._local[user_id] = (version, ids, time.monotonic() + self.timeout)
+            self._local.move_to_end(user_id)
+            while len(self._local) > self.max_users:
+                self._local.popitem(last=False)
+        return ids
+
+    @staticmethod
+    def load(user_id):
+        return frozenset(Membership.objects.filter(user_id=user_id).values_list('conversation_id', flat=True))
+
+    def invalidate(self, user_ids):
+        """Drop the cached sets of ``user_ids`` in this and every other process."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        # A fresh random version per call, set for all users in one round trip
+        version = uuid.uuid4().hex
+        cache.set_many({self.version_key(user_id): version for user_id in user_ids}, None)
+        with self._lock:
+            for user_id in user_ids:
+                self._local.pop(user_id, None)
+
+    def invalidate_on_commit(self, user_ids):
+        """
+        Invalidate now and again once the current transaction commits. Until
+        the commit, a concurrent request still reads the old membership and
+        could cache it under the new version; the second bump discards that.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        self.invalidate(user_ids)
+        transaction.on_commit(lambda: self.invalidate(user_ids))
+
+    def clear(self):
+        """Empty the local LRU; the shared cache is left alone."""
+        with self._lock:
+            self._local.clear()
+
+
+membership_cache = MembershipCache()
+
+
+def conversation_filter(user, field='conversation_id'):
+    """
+    Q object limiting ``field`` to the user's conversations.
+
+    Uses the cached id set; users in more than MEMBERSHIP_CACHE_MAX_IN
+    conversations fall back to a subquery so the IN list stays short.
+    """
+    ids = membership_cache.conversation_ids(user.pk)
+    if len(ids) > getattr(settings, 'MEMBERSHIP_CACHE_MAX_IN', 500):
+        ids = Subquery(Membership.objects.filter(user_id=user.pk).values('conversation_id'))
+    return Q(**{f'{field}__in': ids})
+
+
+# Participant changes straight on the through table. They send no m2m_changed
+# signal, so each one invalidates the cache itself, again on commit. Each runs
+# in a transaction; savepoint=False lets nested calls join the outer one.
+
+def bulk_add_participants(conversation_id, user_ids):
+    """Add users with one lookup and one bulk insert; return the ids actually added."""
+    user_ids = set(user_ids)
+    with transaction.atomic(savepoint=False):
+        existing = set(Membership.objects.filter(
+            conversation_id=conversation_id, user_id__in=user_ids).values_list('user_id', flat=True))
+        added = user_ids - existing
+        Membership.objects.bulk_create(
+            [Membership(conversation_id=conversation_id, user_id=user_id) for user_id in added],
+            ignore_conflicts=True
+        )
+        membership_cache.invalidate_on_commit(added)
+    return added
+
+
+def bulk_remove_participants(conversation_id, user_ids):
+    """Remove users with one lookup and one delete; return the ids actually removed."""
+    with transaction.atomic(savepoint=False):
+        memberships = Membership.objects.filter(conversation_id=conversation_id, user_id__in=set(user_ids))
+        removed = set(memberships.values_list('user_id', flat=True))
+        if removed:
+            Membership.objects.filter(conversation_id=conversation_id, user_id__in=removed).delete()
+            membership_cache.invalidate_on_commit(removed)
+    return removed
+
+
+def set_participants(conversation_id, user_ids):
+    """Make ``user_ids`` the exact participant set, touching only the difference."""
+    user_ids = set(user_ids)
+    with transaction.atomic(savepoint=False):
+        current = set(Membership.objects.filter(conversation_id=conversation_id).values_list('user_id', flat=True))
+        if current - user_ids:
+            bulk_remove_participants(conversation_id, current - user_ids)
+        if user_ids - current:
+            bulk_add_participants(conversation_id, user_ids - current)
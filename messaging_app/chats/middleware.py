@@ -0,0 +1,67 @@
+import gzip
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import zstandard
+except ImportError:  # zstd is offered only when the zstandard package is installed
+    zstandard = None
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with zstd or gzip, whichever the client accepts
+    (zstd preferred). Regular responses smaller than COMPRESSION_MIN_SIZE
+    bytes are sent as is; streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        encoding = self.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self.compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            response.content = self.compress(response.content, encoding)
+            response['Content-Length'] = str(len(response.content))
+        response['Content-Encoding'] = encoding
+        return response
+
+    def choose_encoding(self, accept_encoding):
+        accepted = {value.split(';')[0].strip().lower() for value in accept_encoding.split(',')}
+        if zstandard is not None and 'zstd' in accepted:
+            return 'zstd'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def compress(self, content, encoding):
+        if encoding == 'zstd':
+            return zstandard.ZstdCompressor().compress(content)
+        return gzip.compress(content, mtime=0)
+
+    def compress_stream(self, chunks, encoding):
+        if encoding == 'zstd':
+            compressor = zstandard.ZstdCompressor().compressobj()
+        else:
+            compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
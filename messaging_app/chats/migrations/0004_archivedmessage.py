@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0003_alter_message_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedMessage',
+            fields=[
+                ('message_id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('message_body', models.TextField()),
+                ('sent_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='chats.conversation')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['conversation', 'sent_at'], name='chats_archi_convers_b0baea_idx')],
+            },
+        ),
+    ]
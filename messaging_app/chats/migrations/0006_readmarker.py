@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0005_backgroundtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadMarker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'sent_at'], name='chats_messa_convers_d4d1d7_idx'),
+        ),
+        migrations.AddField(
+            model_name='readmarker',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to='chats.conversation'),
+        ),
+        migrations.AddField(
+            model_name='readmarker',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='readmarker',
+            constraint=models.UniqueConstraint(fields=('user', 'conversation'), name='unique_read_marker'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:15
+
+import uuid
+
+import chats.fields
+from django.db import migrations
+
+
+def compact_columns(apps):
+    """(table, column) for every CompactUUIDField key and foreign key to one."""
+    columns = []
+    for model in apps.get_models(include_auto_created=True):
+        for field in model._meta.local_fields:
+            target = field.target_field if field.is_relation else field
+            if isinstance(target, chats.fields.CompactUUIDField):
+                columns.append((model._meta.db_table, field.column))
+    return columns
+
+
+def convert(apps, schema_editor, source_type, to_stored):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    quote = schema_editor.quote_name
+    tables = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        for table, column in compact_columns(apps):
+            if table not in tables:
+                continue
+            cursor.execute(
+                f'SELECT rowid, {quote(column)} FROM {quote(table)} WHERE typeof({quote(column)}) = %s',
+                [source_type],
+            )
+            rows = cursor.fetchall()
+            cursor.executemany(
+                f'UPDATE {quote(table)} SET {quote(column)} = %s WHERE rowid = %s',
+                [(to_stored(value), rowid) for rowid, value in rows],
+            )
+
+
+def hex_to_bytes(apps, schema_editor):
+    # The table rebuilds above copy the 32-character hex text unchanged
+    convert(apps, schema_editor, 'text', lambda value: uuid.UUID(value).bytes)
+
+
+def bytes_to_hex(apps, schema_editor):
+    convert(apps, schema_editor, 'blob', lambda value: uuid.UUID(bytes=bytes(value)).hex)
+
+
+def check_mysql_empty(apps, schema_editor):
+    # CHAR(32) to BINARY(16) would truncate the hex text rather than decode it
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    User = apps.get_model('chats', 'User')
+    Conversation = apps.get_model('chats', 'Conversation')
+    if User.objects.exists() or Conversation.objects.exists():
+        raise RuntimeError(
+            'chats.0007 cannot convert existing MySQL rows in place; '
+            'export the data, migrate an empty database and reload it.'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0006_readmarker'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_mysql_empty, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='archivedmessage',
+            name='message_id',
+            field=chats.fields.CompactUUIDField(editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='conversation',
+            name='conversation_id',
+            field=chats.fields.CompactUUIDField(default=chats.fields.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='message',
+            name='message_id',
+            field=chats.fields.CompactUUIDField(default=chats.fields.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='user_id',
+            field=chats.fields.CompactUUIDField(default=chats.fields.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(hex_to_bytes, bytes_to_hex),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chats', '0007_compact_uuid_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sent_at', 'message_id'], name='chats_messa_sent_at_0a044e_idx'),
+        ),
+    ]
@@ -1,11 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-import uuid
+
+from .fields import CompactUUIDField, uuid7
 
 # Create your models here.
 
 class User(AbstractUser):
-    user_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
+    user_id = CompactUUIDField(primary_key=True, default=uuid7, editable=False)
     # first_name, last_name, email, and password are already included in AbstractUser
     # We'll override email to make it unique and required
     email = models.EmailField(unique=True, null=False, blank=False)
@@ -25,7 +26,7 @@ class User(AbstractUser):
         return f"{self.username} ({self.email})"
     
 class Conversation(models.Model):
-    conversation_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
+    conversation_id = CompactUUIDField(primary_key=True, default=uuid7, editable=False)
     participants = models.ManyToManyField(User, related_name='conversations')
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -33,11 +34,77 @@ class Conversation(models.Model):
         return f"Conversation {self.conversation_id}"
     
 class Message(models.Model):
-    message_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False, db_index=True)
+    message_id = CompactUUIDField(primary_key=True, default=uuid7, editable=False)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='messages')
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
     message_body = models.TextField(null=False)
     sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', 'sent_at']),
+            # archive_messages walks old messages in (sent_at, key) order across all conversations
+            models.Index(fields=['sent_at', 'message_id']),
+        ]
     
     def __str__(self):
-        return f"Message from {self.sender.username} in {self.conversation_id}"
\ No newline at end of file
+        return f"Message from {self.sender.username} in {self.conversation_id}"
+
+class ArchivedMessage(models.Model):
+    """Message moved out of the hot Message table by the archive_messages command."""
+    message_id = CompactUUIDField(primary_key=True, editable=False)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_messages')
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='archived_messages')
+    message_body = models.TextField(null=False)
+    sent_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['conversation', 'sent_at'])]
+
+    def __str__(self):
+        return f"Archived message from {self.sender.username} in {self.conversation_id}"
+
+
+class ReadMarker(models.Model):
+    """How far a user has read a conversation: every message sent at or before last_read_at."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='read_markers')
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='read_markers')
+    last_read_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'conversation'], name='unique_read_marker')]
+
+    def __str__(self):
+        return f"{self.user_id} read {self.conversation_id} up to {self.last_read_at}"
+
+
+class BackgroundTask(models.Model):
+    """Queued side effect, run by the run_task_worker command (see chats.queue).
+
+    Rows are deleted once they succeed; failed rows stay for inspection.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField()
+    claimed_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -1,15 +1,153 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, InvalidPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.utils.http import urlencode
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from .renderers import iter_json_page
+from .signals import MESSAGE_COUNT_GENERATION_KEY
+
+
+class LookaheadPage(Page):
+    """Page that knows whether a next page exists without a total count."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class LookaheadPaginator(Paginator):
+    """
+    Paginator that fetches one row past the page to detect a next page,
+    so paging never needs a COUNT query.
+    """
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        return LookaheadPage(rows[:self.per_page], number, self, len(rows) > self.per_page)
 
 
 class MessageResultsSetPagination(PageNumberPagination):
+    """
+    Page number pagination whose total count is chosen by the
+    MESSAGE_COUNT_STRATEGY setting:
+
+    - ``exact``: COUNT query on every page (default).
+    - ``cached``: exact count cached for MESSAGE_COUNT_CACHE_TTL seconds per
+      user and filter set, dropped whenever a message is written.
+    - ``estimated``: the database planner's row estimate; falls back to
+      ``cached`` on backends without one (SQLite).
+    - ``none``: no count in the response.
+
+    All strategies except ``exact`` page with LookaheadPaginator.
+    """
     page_size = 20
     page_size_query_param = 'page_size'
     max_page_size = 100
-    
+
+    @property
+    def count_strategy(self):
+        return getattr(settings, 'MESSAGE_COUNT_STRATEGY', 'exact')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.count_strategy == 'exact':
+            page = super().paginate_queryset(queryset, request, view)
+            if page is not None:
+                self.count = self.page.paginator.count
+            return page
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = LookaheadPaginator(queryset, page_size)
+        page_number = request.query_params.get(self.page_query_param) or 1
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        self.count = self.get_count(queryset, request)
+        return list(self.page)
+
+    def get_count(self, queryset, request):
+        """Return the total for the non-exact strategies, or None to omit it."""
+        strategy = self.count_strategy
+        if strategy == 'none':
+            return None
+        if strategy == 'estimated':
+            estimate = self.estimate_count(queryset)
+            if estimate is not None:
+                return estimate
+        return cache.get_or_set(
+            self.count_cache_key(request), queryset.count,
+            getattr(settings, 'MESSAGE_COUNT_CACHE_TTL', 60)
+        )
+
+    def count_cache_key(self, request):
+        params = sorted(
+            (key, value) for key, value in request.query_params.lists()
+            if key not in (self.page_query_param, self.page_size_query_param)
+        )
+        digest = hashlib.md5(urlencode(params, doseq=True).encode()).hexdigest()
+        generation = cache.get(MESSAGE_COUNT_GENERATION_KEY, 0)
+        return f'chats:message-count:{generation}:{request.user.pk}:{request.path}:{digest}'
+
+    def estimate_count(self, queryset):
+        """Row estimate from EXPLAIN on PostgreSQL and MySQL, else None."""
+        connection = connections[queryset.db]
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]['Plan']['Plan Rows'])
+            if connection.vendor == 'mysql':
+                cursor.execute(f'EXPLAIN {sql}', params)
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                return max((int(row['rows'] or 0) for row in rows), default=0)
+        return None
+
+    def get_envelope(self):
+        envelope = {}
+        if self.count is not None:
+            envelope['count'] = self.count
+        envelope['next'] = self.get_next_link()
+        envelope['previous'] = self.get_previous_link()
+        return envelope
+
     def get_paginated_response(self, data):
-        return Response({
-            'count': self.page.paginator.count,
-            'next': self.get_next_link(),
-            'previous': self.get_previous_link(),
-            'results': data
-        })
\ No newline at end of file
+        return Response(dict(self.get_envelope(), results=data))
+
+    def get_streaming_response(self, rows, serialize):
+        """
+        Stream the same body as get_paginated_response, serializing the page
+        a chunk at a time instead of building it in memory first.
+        """
+        return StreamingHttpResponse(iter_json_page(self.get_envelope(), rows, serialize),
+                                     content_type='application/json')
@@ -0,0 +1,27 @@
+import uuid
+
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .renderers import UUID_EXT_TYPE
+
+
+def _ext_hook(code, data):
+    if code == UUID_EXT_TYPE:
+        return str(uuid.UUID(bytes=data))
+    return msgpack.ExtType(code, data)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parse MessagePack request bodies. UUID ext values become UUID strings,
+    so serializers see the same input as they would from JSON.
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), ext_hook=_ext_hook, raw=False)
+        except ValueError as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
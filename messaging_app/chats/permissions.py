@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission
 from chats.models import Conversation
+from chats.membership import membership_cache
 from rest_framework import permissions
 
 
@@ -12,7 +13,7 @@ class IsParticipantOfConversation(BasePermission):
         """
         Check if the user is a participant of the conversation.
         """
-        return request.user in obj.participants.all()
+        return obj.pk in membership_cache.conversation_ids(request.user.pk)
     
 class IsOwnerOrReadOnly(BasePermission):
     """
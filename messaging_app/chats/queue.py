@@ -0,0 +1,147 @@
+"""
+Durable background tasks for message side effects.
+
+Handlers are registered with ``@task`` (see chats.tasks) and queued with
+``Task.delay``, which writes a BackgroundTask row once the surrounding
+transaction commits. The run_task_worker command claims pending rows, runs
+them and retries failures with exponential backoff. Handlers registered with
+``batch=True`` receive every claimed payload of their kind in one call.
+"""
+import logging
+import traceback
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+class Task:
+    """A registered handler; call it to run inline or use ``delay`` to queue it."""
+
+    def __init__(self, func, name, batch, max_attempts):
+        self.func = func
+        self.name = name
+        self.batch = batch
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, **payload):
+        """Queue the task with a JSON-serializable payload after the current transaction commits."""
+        transaction.on_commit(lambda: BackgroundTask.objects.create(
+            name=self.name, payload=payload, max_attempts=self.max_attempts, run_after=timezone.now()
+        ))
+
+    def delay_many(self, payloads):
+        """Queue one task per payload, with a single insert after the current transaction commits."""
+        payloads = list(payloads)
+        transaction.on_commit(lambda: BackgroundTask.objects.bulk_create([
+            BackgroundTask(name=self.name, payload=payload, max_attempts=self.max_attempts, run_after=timezone.now())
+            for payload in payloads
+        ]))
+
+    def run(self, tasks):
+        if self.batch:
+            self.func([task.payload for task in tasks])
+        else:
+            for task in tasks:
+                self.func(**task.payload)
+
+
+def task(name=None, batch=False, max_attempts=5):
+    """Register the decorated function as a background task."""
+    def decorator(func):
+        registered = Task(func, name or f'{func.__module__}.{func.__name__}', batch, max_attempts)
+        registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def claimable(now):
+    return Q(status=BackgroundTask.PENDING, run_after__lte=now)
+
+
+def release_expired(now):
+    """
+    Return running tasks whose lease expired to the queue, counting the run
+    as a failed attempt: the worker died, possibly because of the task. Tasks
+    out of attempts are marked failed, so one that keeps crashing its worker
+    is not retried forever.
+    """
+    return BackgroundTask.objects.filter(status=BackgroundTask.RUNNING, locked_until__lt=now).update(
+        status=Case(
+            When(attempts__gte=F('max_attempts') - 1, then=Value(BackgroundTask.FAILED)),
+            default=Value(BackgroundTask.PENDING),
+        ),
+        attempts=F('attempts') + 1,
+        last_error='Lease expired before the task finished; its worker stopped.',
+        locked_until=None,
+        run_after=now,
+    )
+
+
+def claim(worker_id, limit, lease=timedelta(minutes=5)):
+    """Mark up to ``limit`` due tasks as running for ``worker_id`` and return them."""
+    now = timezone.now()
+    release_expired(now)
+    ids = list(
+        BackgroundTask.objects.filter(claimable(now)).order_by('run_after').values_list('pk', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    # The filter is repeated so rows another worker claimed in between are skipped
+    BackgroundTask.objects.filter(claimable(now), pk__in=ids).update(
+        status=BackgroundTask.RUNNING, claimed_by=worker_id, locked_until=now + lease
+    )
+    return list(BackgroundTask.objects.filter(pk__in=ids, claimed_by=worker_id, status=BackgroundTask.RUNNING))
+
+
+def run_claimed(tasks):
+    """Run claimed tasks, grouping batch handlers; return how many succeeded."""
+    groups = defaultdict(list)
+    for claimed in tasks:
+        groups[claimed.name].append(claimed)
+
+    succeeded = 0
+    for name, group in groups.items():
+        handler = registry.get(name)
+        if handler is None:
+            fail(group, f'No task registered as {name!r}', retry=False)
+            continue
+        units = [group] if handler.batch else [[claimed] for claimed in group]
+        for unit in units:
+            try:
+                handler.run(unit)
+            except Exception:
+                logger.exception('Task %s failed', name)
+                fail(unit, traceback.format_exc())
+            else:
+                BackgroundTask.objects.filter(pk__in=[claimed.pk for claimed in unit]).delete()
+                succeeded += len(unit)
+    return succeeded
+
+
+def fail(tasks, error, retry=True):
+    """Reschedule failed tasks with exponential backoff, or give up after max_attempts."""
+    backoff = getattr(settings, 'TASK_RETRY_BACKOFF', 5)
+    now = timezone.now()
+    for failed in tasks:
+        failed.attempts += 1
+        failed.last_error = error
+        failed.locked_until = None
+        if retry and failed.attempts < failed.max_attempts:
+            failed.status = BackgroundTask.PENDING
+            failed.run_after = now + timedelta(seconds=backoff * 2 ** (failed.attempts - 1))
+        else:
+            failed.status = BackgroundTask.FAILED
+        failed.save(update_fields=['attempts', 'last_error', 'locked_until', 'status', 'run_after'])
@@ -0,0 +1,74 @@
+"""
+Read state as one watermark per (user, conversation).
+
+A ReadMarker says the user has read every message sent at or before
+``last_read_at``; unread counts are the messages after it, which the
+(conversation, sent_at) index on Message answers with one range scan per
+conversation.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Case, Count, DateTimeField, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Message, ReadMarker
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def mark_read(user_id, positions):
+    """
+    Move watermarks forward. ``positions`` maps conversation ids to the
+    datetime read up to, or None for the latest message. Positions in the
+    future are clamped to now, otherwise messages sent before that time
+    would never count as unread. Watermarks never move back. Returns the
+    resulting watermark per conversation.
+    """
+    latest_needed = [conversation_id for conversation_id, up_to in positions.items() if up_to is None]
+    if latest_needed:
+        latest = dict(
+            Message.objects.filter(conversation_id__in=latest_needed)
+            .values('conversation_id').annotate(latest=Max('sent_at')).values_list('conversation_id', 'latest')
+        )
+        positions = {conversation_id: up_to or latest.get(conversation_id)
+                     for conversation_id, up_to in positions.items()}
+
+    now = timezone.now()
+    wanted = {conversation_id: min(up_to, now) for conversation_id, up_to in positions.items() if up_to is not None}
+    if wanted:
+        # Insert missing markers, then move every marker forward in one
+        # conditional UPDATE: a concurrent call carrying an older position
+        # cannot overwrite a newer watermark
+        with transaction.atomic(savepoint=False):
+            ReadMarker.objects.bulk_create(
+                [ReadMarker(user_id=user_id, conversation_id=conversation_id, last_read_at=up_to)
+                 for conversation_id, up_to in wanted.items()],
+                ignore_conflicts=True
+            )
+            ReadMarker.objects.filter(user_id=user_id, conversation_id__in=wanted).update(
+                last_read_at=Greatest('last_read_at', Case(
+                    *(When(conversation_id=conversation_id, then=Value(up_to))
+                      for conversation_id, up_to in wanted.items()),
+                    output_field=DateTimeField(),
+                ))
+            )
+    current = dict(
+        ReadMarker.objects.filter(user_id=user_id, conversation_id__in=positions)
+        .values_list('conversation_id', 'last_read_at')
+    )
+    return {conversation_id: current.get(conversation_id) for conversation_id in positions}
+
+
+def unread_counts(user_id, conversation_ids):
+    """Messages from others after the user's watermark, per conversation, in one query."""
+    watermark = ReadMarker.objects.filter(
+        user_id=user_id, conversation_id=OuterRef('conversation_id')).values('last_read_at')
+    counts = dict(
+        Message.objects.filter(conversation_id__in=conversation_ids)
+        .exclude(sender_id=user_id)
+        .filter(sent_at__gt=Coalesce(Subquery(watermark), Value(EPOCH, output_field=DateTimeField())))
+        .values('conversation_id').annotate(unread=Count('pk')).values_list('conversation_id', 'unread')
+    )
+    return {conversation_id: counts.get(conversation_id, 0) for conversation_id in conversation_ids}
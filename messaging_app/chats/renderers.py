@@ -0,0 +1,65 @@
+import uuid
+
+import msgpack
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+# Ext type code carrying a UUID as its raw 16 bytes.
+UUID_EXT_TYPE = 1
+
+# Keys whose string values are UUIDs in chats responses.
+UUID_FIELDS = frozenset({
+    'user_id', 'conversation_id', 'message_id', 'sender', 'conversation', 'participants',
+})
+
+
+def _pack_uuid_strings(data, key=None):
+    """Swap UUID strings under UUID_FIELDS keys for UUID ext values."""
+    if isinstance(data, dict):
+        return {k: _pack_uuid_strings(v, k) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_pack_uuid_strings(item, key) for item in data]
+    if key in UUID_FIELDS and isinstance(data, str):
+        # Error payloads use the same keys for messages, e.g. 'This field is required.'
+        try:
+            return msgpack.ExtType(UUID_EXT_TYPE, uuid.UUID(data).bytes)
+        except ValueError:
+            return data
+    return data
+
+
+def _default(obj):
+    if isinstance(obj, uuid.UUID):
+        return msgpack.ExtType(UUID_EXT_TYPE, obj.bytes)
+    return str(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Render responses as MessagePack. UUIDs are sent as ext type 1 holding
+    the raw 16 bytes instead of 36-character strings.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(_pack_uuid_strings(data), default=_default, use_bin_type=True)
+
+
+def iter_json_page(envelope, rows, serialize, chunk_size=20):
+    """
+    Yield a paginated JSON body in pieces: ``envelope`` followed by a
+    ``results`` list built by calling ``serialize`` on ``chunk_size`` rows at
+    a time. The joined output is byte-identical to JSONRenderer rendering
+    ``dict(envelope, results=serialize(rows))``.
+    """
+    renderer = JSONRenderer()
+    head = renderer.render(envelope)
+    yield head[:-1] + (b',"results":[' if envelope else b'"results":[')
+    for start in range(0, len(rows), chunk_size):
+        chunk = renderer.render(serialize(rows[start:start + chunk_size]))[1:-1]
+        yield chunk if start == 0 else b',' + chunk
+    yield b']}'
@@ -1,6 +1,88 @@
-from rest_framework import serializers
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from rest_framework.settings import api_settings
+from .membership import bulk_add_participants, membership_cache, set_participants
 from .models import User, Message, Conversation
 
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    """ManyRelatedField that looks every submitted pk up in one query."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        child = self.child_relation
+        pk_field = child.get_queryset().model._meta.pk
+        pks = []
+        for item in data:
+            try:
+                pks.append(pk_field.to_python(item))
+            except (TypeError, DjangoValidationError):
+                child.fail('incorrect_type', data_type=type(item).__name__)
+        objects = child.get_queryset().in_bulk(pks)
+        for pk in pks:
+            if pk not in objects:
+                child.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in dict.fromkeys(pks)]
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField whose ``many=True`` form validates in one query."""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+
+class UserListSerializer(serializers.ListSerializer):
+    """
+    Bulk create users, checking email and username uniqueness for the whole
+    batch with one IN query each instead of one query per row. At most
+    USER_IMPORT_MAX_USERS users per request.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', getattr(settings, 'USER_IMPORT_MAX_USERS', 1000))
+        super().__init__(*args, **kwargs)
+
+    def validate(self, attrs):
+        errors = {}
+        for field in ('email', 'username'):
+            values = [item[field] for item in attrs]
+            seen = set()
+            duplicates = {value for value in values if value in seen or seen.add(value)}
+            existing = set(User.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True))
+            conflicts = sorted(duplicates | existing)
+            if conflicts:
+                errors[field] = [f"A user with this {field} already exists: {value}" for value in conflicts]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        """
+        Create all users with a single bulk_create, all or none.
+        """
+        try:
+            with transaction.atomic():
+                return User.objects.bulk_create([User(**item) for item in validated_data], batch_size=500)
+        except IntegrityError:
+            # Usually a username or email taken concurrently since validate()
+            self.validate(validated_data)
+            raise serializers.ValidationError("The users could not be created; no user was imported.")
+
+
 class UserSerializer(serializers.Serializer):
     user_id = serializers.UUIDField(read_only=True)
     username = serializers.CharField(max_length=150)
@@ -13,11 +95,20 @@ class UserSerializer(serializers.Serializer):
     created_at = serializers.DateTimeField(read_only=True)
     password_hash = serializers.CharField(write_only=True)
 
+    class Meta:
+        list_serializer_class = UserListSerializer
+
     def create(self, validated_data):
         """
         Create and return a new User instance, given the validated data.
+        Email and username uniqueness is enforced by the database constraints.
         """
-        return User.objects.create(**validated_data)
+        try:
+            with transaction.atomic():
+                return User.objects.create(**validated_data)
+        except IntegrityError:
+            self.raise_unique_error(validated_data)
+            raise
 
     def update(self, instance, validated_data):
         """
@@ -31,16 +122,25 @@ class UserSerializer(serializers.Serializer):
         instance.role = validated_data.get('role', instance.role)
         if 'password_hash' in validated_data:
             instance.password_hash = validated_data.get('password_hash')
-        instance.save()
+        try:
+            with transaction.atomic():
+                instance.save()
+        except IntegrityError:
+            self.raise_unique_error(validated_data, instance)
+            raise
         return instance
 
-    def validate_email(self, value):
+    def raise_unique_error(self, validated_data, instance=None):
         """
-        Check that the email is unique.
+        Turn a unique constraint failure into a field ValidationError.
+        Only runs after an insert or update has already failed.
         """
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError("A user with this email already exists.")
-        return value
+        others = User.objects.all()
+        if instance is not None:
+            others = others.exclude(pk=instance.pk)
+        for field in ('email', 'username'):
+            if field in validated_data and others.filter(**{field: validated_data[field]}).exists():
+                raise serializers.ValidationError({field: [f"A user with this {field} already exists."]})
 
     def get_full_name(self, obj):
         """
@@ -50,7 +150,28 @@ class UserSerializer(serializers.Serializer):
         last_name = obj.last_name or ""
         return f"{first_name} {last_name}".strip()
 
-class MessageSerializer(serializers.Serializer):
+class UserSummarySerializer(serializers.Serializer):
+    """Compact user projection embedded in messages with ?expand=sender."""
+    user_id = serializers.UUIDField(read_only=True)
+    username = serializers.CharField(read_only=True)
+    full_name = serializers.SerializerMethodField()
+
+    def get_full_name(self, obj):
+        return UserSerializer.get_full_name(self, obj)
+
+class SparseFieldsMixin:
+    """
+    Accept a ``fields`` argument and drop every other declared field, so a
+    ``?fields=`` request only serializes what it asked for.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class MessageSerializer(SparseFieldsMixin, serializers.Serializer):
     message_id = serializers.UUIDField(read_only=True)
     sender = serializers.PrimaryKeyRelatedField( read_only=True)
     conversation = serializers.PrimaryKeyRelatedField(queryset=Conversation.objects.all())
@@ -73,9 +194,27 @@ class MessageSerializer(serializers.Serializer):
         instance.save()
         return instance
 
-class ConversationSerializer(serializers.Serializer):
+class ParticipantIdsSerializer(serializers.Serializer):
+    """Input of the bulk participant actions: existing user ids, checked in one query."""
+    user_ids = BulkPrimaryKeyRelatedField(queryset=User.objects.only('user_id'), many=True)
+
+class ReadMarkerSerializer(serializers.Serializer):
+    """One entry of a mark-read request; read_up_to defaults to the latest message."""
+    conversation = serializers.UUIDField()
+    read_up_to = serializers.DateTimeField(required=False)
+
+    def validate_conversation(self, value):
+        if value not in membership_cache.conversation_ids(self.context['request'].user.pk):
+            raise serializers.ValidationError("You are not a participant of this conversation.")
+        return value
+
+class ExpandedMessageSerializer(MessageSerializer):
+    """MessageSerializer with the sender embedded as a UserSummarySerializer."""
+    sender = UserSummarySerializer(read_only=True)
+
+class ConversationSerializer(SparseFieldsMixin, serializers.Serializer):
     conversation_id = serializers.UUIDField(read_only=True)
-    participants = serializers.PrimaryKeyRelatedField(
+    participants = BulkPrimaryKeyRelatedField(
         queryset=User.objects.all(),
         many=True
     )
@@ -88,7 +227,7 @@ class ConversationSerializer(serializers.Serializer):
         """
         participants = validated_data.pop('participants')
         conversation = Conversation.objects.create(**validated_data)
-        conversation.participants.set(participants)
+        bulk_add_participants(conversation.pk, [user.pk for user in participants])
         return conversation
 
     def update(self, instance, validated_data):
@@ -97,7 +236,178 @@ class ConversationSerializer(serializers.Serializer):
         """
         if 'participants' in validated_data:
             participants = validated_data.pop('participants')
-            instance.participants.set(participants)
+            set_participants(instance.pk, [user.pk for user in participants])
         instance.save()
         return instance
 
+
+# Read-only fast paths for list endpoints. They work on ``values_list`` rows
+# instead of model instances, skip per-field serializer machinery, and return
+# plain str/int values so DRF's JSONRenderer hits the C encoder directly.
+# The rendered JSON is identical to the serializers above.
+
+def _datetime_representation():
+    """
+    Return DateTimeField.to_representation with the current timezone looked
+    up once rather than per value. Non-ISO formats and naive datetimes fall
+    back to the DRF implementation.
+    """
+    field = serializers.DateTimeField()
+    field_timezone = field.default_timezone()
+    if field_timezone is None or api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+        return field.to_representation
+
+    def represent(value):
+        if not value:
+            return None
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return represent
+
+
+def _full_name(first_name, last_name):
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+
+class FastUserSerializer:
+    """Read-only equivalent of UserSerializer for ``values_list`` rows."""
+    columns = ('user_id', 'username', 'email', 'first_name', 'last_name',
+               'phone_number', 'role', 'created_at')
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @property
+    def data(self):
+        datetime_representation = _datetime_representation()
+        return [
+            {
+                'user_id': str(user_id),
+                'username': username,
+                'email': email,
+                'first_name': first_name,
+                'last_name': last_name,
+                'full_name': _full_name(first_name, last_name),
+                'phone_number': phone_number,
+                'role': role,
+                'created_at': datetime_representation(created_at),
+            }
+            for user_id, username, email, first_name, last_name, phone_number, role, created_at in self.rows
+        ]
+
+
+class FastMessageSerializer:
+    """
+    Read-only equivalent of MessageSerializer for ``values_list`` rows, or of
+    ExpandedMessageSerializer when ``expand_sender`` is set. ``fields``
+    restricts the output to a subset of ``field_names``. Rows must come from
+    ``columns_for`` with the same arguments; the sender columns are joined
+    into the page query so expansion costs no extra queries.
+    """
+    field_names = ('message_id', 'sender', 'conversation', 'message_body', 'sent_at')
+    field_columns = {
+        'message_id': ('message_id',),
+        'sender': ('sender_id',),
+        'conversation': ('conversation_id',),
+        'message_body': ('message_body',),
+        'sent_at': ('sent_at',),
+    }
+    sender_columns = ('sender__username', 'sender__first_name', 'sender__last_name')
+
+    def __init__(self, rows, expand_sender=False, fields=None):
+        self.rows = rows
+        self.expand_sender = expand_sender
+        self.fields = [name for name in self.field_names if fields is None or name in fields]
+
+    @classmethod
+    def columns_for(cls, expand_sender=False, fields=None):
+        columns = []
+        for name in cls.field_names:
+            if fields is None or name in fields:
+                columns.extend(cls.field_columns[name])
+                if name == 'sender' and expand_sender:
+                    columns.extend(cls.sender_columns)
+        return columns
+
+    def getters(self):
+        """Return (field, getter) pairs that read each output value from a row."""
+        datetime_representation = _datetime_representation()
+        getters = []
+        index = 0
+        for name in self.fields:
+            i = index
+            if name == 'sender' and self.expand_sender:
+                getters.append((name, lambda row, i=i: {
+                    'user_id': str(row[i]),
+                    'username': row[i + 1],
+                    'full_name': _full_name(row[i + 2], row[i + 3]),
+                }))
+                index += 4
+                continue
+            if name == 'message_body':
+                getters.append((name, lambda row, i=i: row[i]))
+            elif name == 'sent_at':
+                getters.append((name, lambda row, i=i: datetime_representation(row[i])))
+            else:
+                getters.append((name, lambda row, i=i: str(row[i])))
+            index += 1
+        return getters
+
+    @property
+    def data(self):
+        getters = self.getters()
+        return [{name: get(row) for name, get in getters} for row in self.rows]
+
+
+class FastConversationSerializer:
+    """
+    Read-only equivalent of ConversationSerializer for ``values_list`` rows.
+    Participants and messages for the whole page are loaded with one query
+    each, and only when they are among the requested ``fields``.
+    """
+    field_names = ('conversation_id', 'participants', 'messages', 'created_at')
+
+    def __init__(self, rows, fields=None):
+        self.rows = rows
+        self.fields = [name for name in self.field_names if fields is None or name in fields]
+
+    @classmethod
+    def columns_for(cls, fields=None):
+        if fields is None or 'created_at' in fields:
+            return ['conversation_id', 'created_at']
+        return ['conversation_id']
+
+    @property
+    def data(self):
+        datetime_representation = _datetime_representation()
+        rows = list(self.rows)
+        conversation_ids = [row[0] for row in rows]
+
+        participants = defaultdict(list)
+        if 'participants' in self.fields:
+            memberships = Conversation.participants.through.objects.filter(
+                conversation_id__in=conversation_ids
+            ).order_by('conversation_id', 'user_id').values_list('conversation_id', 'user_id')
+            for conversation_id, user_id in memberships:
+                participants[conversation_id].append(str(user_id))
+
+        messages = defaultdict(list)
+        if 'messages' in self.fields:
+            message_rows = Message.objects.filter(
+                conversation_id__in=conversation_ids
+            ).values_list(*FastMessageSerializer.columns_for())
+            for row in message_rows:
+                messages[row[2]].append(row)
+
+        getters = {
+            'conversation_id': lambda row: str(row[0]),
+            'participants': lambda row: participants[row[0]],
+            'messages': lambda row: FastMessageSerializer(messages[row[0]]).data,
+            'created_at': lambda row: datetime_representation(row[1]),
+        }
+        getters = [(name, getters[name]) for name in self.fields]
+        return [{name: get(row) for name, get in getters} for row in rows]
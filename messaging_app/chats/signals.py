@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .membership import membership_cache
+from .models import Conversation, Message
+
+# Bumped on every message write so cached counts are never stale for long.
+# Defined here rather than in pagination so app loading (and processes that
+# never serve the API, like run_task_worker) does not import DRF.
+MESSAGE_COUNT_GENERATION_KEY = 'chats:message-count-generation'
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def invalidate_message_counts(sender, **kwargs):
+    """Invalidate every cached message count when a message is written."""
+    try:
+        cache.incr(MESSAGE_COUNT_GENERATION_KEY)
+    except ValueError:
+        cache.set(MESSAGE_COUNT_GENERATION_KEY, 1, None)
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def invalidate_memberships(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop cached membership sets of users added to or removed from a conversation."""
+    if action == 'pre_clear':
+        # pk_set is None on clear, so remember who is about to be removed
+        instance._cleared_members = (
+            [instance.pk] if reverse else list(instance.participants.values_list('pk', flat=True)))
+    elif action == 'post_clear':
+        membership_cache.invalidate_on_commit(instance.__dict__.pop('_cleared_members', []))
+    elif action in ('post_add', 'post_remove'):
+        membership_cache.invalidate_on_commit([instance.pk] if reverse else pk_set)
+
+
+@receiver(pre_delete, sender=Conversation)
+def remember_conversation_members(sender, instance, **kwargs):
+    instance._deleted_members = list(instance.participants.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Conversation)
+def invalidate_conversation_members(sender, instance, **kwargs):
+    """Deleting a conversation removes its participants without m2m_changed."""
+    membership_cache.invalidate_on_commit(instance.__dict__.pop('_deleted_members', []))
@@ -0,0 +1,22 @@
+import logging
+from collections import Counter
+
+from .queue import task
+
+logger = logging.getLogger(__name__)
+
+
+def message_payload(message):
+    """Payload of message_created for a saved message."""
+    return {
+        'message_id': str(message.message_id),
+        'conversation_id': str(message.conversation_id),
+        'sender_id': str(message.sender_id),
+    }
+
+
+@task(batch=True)
+def message_created(payloads):
+    """Log new message activity, one line per conversation for each batch."""
+    for conversation_id, count in Counter(payload['conversation_id'] for payload in payloads).items():
+        logger.info('%d new message(s) in conversation %s', count, conversation_id)
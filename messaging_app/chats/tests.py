@@ -1,8 +1,49 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import msgpack
 import pytest
+import zstandard
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
-from .models import User, Conversation, Message
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from messaging_app import settings_sqlite
+from . import middleware as middleware_module
+from .fields import uuid7
+from .membership import membership_cache
+from .models import ArchivedMessage, BackgroundTask, User, Conversation, Message
+from .queue import claim, task
+from .receipts import mark_read
+from .renderers import UUID_EXT_TYPE, iter_json_page
+from .serializers import (
+    ConversationSerializer,
+    ExpandedMessageSerializer,
+    FastConversationSerializer,
+    FastMessageSerializer,
+    FastUserSerializer,
+    MessageSerializer,
+    UserSerializer,
+)
+from .signals import MESSAGE_COUNT_GENERATION_KEY
+from .writer import MessageWriter
 
 User = get_user_model()
 
@@ -103,6 +144,844 @@ class MessageModelTests(TestCase):
         self.assertEqual(str(self.message), expected_str)
 
 
+class CompactUUIDTests(TestCase):
+    """Primary keys are time-ordered and stored as 16 bytes"""
+
+    def test_uuid7_ordering(self):
+        """Test keys are version 7 and sort in creation order"""
+        keys = [uuid7() for _ in range(3)]
+        time.sleep(0.002)
+        keys.append(uuid7())
+        self.assertTrue(all(key.version == 7 and key.variant == uuid.RFC_4122 for key in keys))
+        self.assertLess(keys[0], keys[-1])
+
+    def test_stored_as_bytes(self):
+        """Test keys and foreign keys are 16-byte blobs that load back as UUIDs"""
+        user = User.objects.create(username='compact', email='compact@example.com', role='guest')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(user)
+        message = Message.objects.create(sender=user, conversation=conversation, message_body='hi')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT typeof(message_id), length(message_id), typeof(sender_id) FROM chats_message'
+            )
+            self.assertEqual(cursor.fetchone(), ('blob', 16, 'blob'))
+        self.assertEqual(Message.objects.get(pk=str(message.pk)).sender_id, user.pk)
+        self.assertEqual(list(user.conversations.values_list('pk', flat=True)), [conversation.pk])
+
+
+class FastSerializerTests(TestCase):
+    """Fast read-only serializers must render exactly like the DRF serializers"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user1 = User.objects.create_user(
+            username='fast1',
+            email='fast1@example.com',
+            password='testpass123',
+            first_name='Fast',
+            last_name='',
+            role='guest'
+        )
+        self.user2 = User.objects.create_user(
+            username='fast2',
+            email='fast2@example.com',
+            password='testpass123',
+            role='host'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+        Conversation.objects.create().participants.add(self.user2)
+        for i in range(3):
+            Message.objects.create(
+                sender=self.user1 if i % 2 else self.user2,
+                conversation=self.conversation,
+                message_body=f'Message {i} \u00e9'
+            )
+
+    def assertRendersSame(self, fast, slow):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(fast), renderer.render(slow))
+
+    def test_message_serializer(self):
+        """Test message output matches MessageSerializer"""
+        queryset = Message.objects.order_by('sent_at')
+        self.assertRendersSame(
+            FastMessageSerializer(queryset.values_list(*FastMessageSerializer.columns_for())).data,
+            MessageSerializer(queryset, many=True).data
+        )
+
+    def test_user_serializer(self):
+        """Test user output matches UserSerializer"""
+        queryset = User.objects.order_by('username')
+        self.assertRendersSame(
+            FastUserSerializer(queryset.values_list(*FastUserSerializer.columns)).data,
+            UserSerializer(queryset, many=True).data
+        )
+
+    def test_conversation_serializer(self):
+        """Test conversation output matches ConversationSerializer"""
+        queryset = Conversation.objects.order_by('created_at')
+        self.assertRendersSame(
+            FastConversationSerializer(queryset.values_list(*FastConversationSerializer.columns_for())).data,
+            ConversationSerializer(queryset, many=True).data
+        )
+
+    def test_expanded_message_serializer(self):
+        """Test expanded message output matches ExpandedMessageSerializer"""
+        queryset = Message.objects.order_by('sent_at')
+        self.assertRendersSame(
+            FastMessageSerializer(queryset.values_list(*FastMessageSerializer.columns_for(expand_sender=True)), True).data,
+            ExpandedMessageSerializer(queryset, many=True).data
+        )
+
+    def test_expand_sender(self):
+        """Test ?expand=sender embeds the sender without extra queries"""
+        client = APIClient()
+        client.force_authenticate(self.user1)
+        client.get('/api/messages/')  # load the membership cache
+        with self.assertNumQueries(2):
+            response = client.get('/api/messages/?expand=sender')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        senders = {message['sender']['username'] for message in response.data['results']}
+        self.assertEqual(senders, {'fast1', 'fast2'})
+        message = Message.objects.filter(sender=self.user1).first()
+        response = client.get(f'/api/messages/{message.message_id}/?expand=sender')
+        self.assertEqual(response.data['sender']['full_name'], 'Fast')
+
+    def test_sparse_fields(self):
+        """Test ?fields= limits output and skips unrequested relations"""
+        client = APIClient()
+        client.force_authenticate(self.user1)
+        response = client.get('/api/messages/?fields=message_id')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'message_id'})
+        with self.assertNumQueries(2):
+            response = client.get('/api/conversations/?fields=conversation_id,created_at')
+        self.assertEqual(set(response.data['results'][0]), {'conversation_id', 'created_at'})
+        message = Message.objects.filter(sender=self.user1).first()
+        response = client.get(f'/api/messages/{message.message_id}/?fields=sender,sent_at&expand=sender')
+        self.assertEqual(set(response.data), {'sender', 'sent_at'})
+        self.assertEqual(response.data['sender']['username'], 'fast1')
+        response = client.get('/api/messages/?fields=message_id,secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_msgpack_round_trip(self):
+        """Test MessagePack responses carry raw UUIDs and requests are parsed"""
+        client = APIClient()
+        client.force_authenticate(self.user1)
+        response = client.get('/api/messages/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        page = msgpack.unpackb(response.content, raw=False)
+        sender = page['results'][0]['sender']
+        self.assertEqual(sender.code, UUID_EXT_TYPE)
+        self.assertEqual(len(sender.data), 16)
+
+        body = msgpack.packb({
+            'conversation': msgpack.ExtType(UUID_EXT_TYPE, self.conversation.conversation_id.bytes),
+            'message_body': 'packed',
+        })
+        response = client.post('/api/messages/', body, content_type='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Message.objects.filter(message_body='packed', conversation=self.conversation).exists())
+
+    def test_msgpack_validation_error(self):
+        """Test error messages under UUID keys are rendered as strings"""
+        client = APIClient()
+        client.force_authenticate(self.user1)
+        response = client.post('/api/messages/', msgpack.packb({'message_body': 'no conversation'}),
+                               content_type='application/msgpack', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(msgpack.unpackb(response.content, raw=False), {'conversation': ['This field is required.']})
+
+    def test_iter_json_page(self):
+        """Test chunked JSON output matches JSONRenderer"""
+        rows = list(Message.objects.values_list(*FastMessageSerializer.columns_for()))
+        envelope = {'count': 3, 'next': None, 'previous': None}
+        body = b''.join(iter_json_page(envelope, rows, lambda chunk: FastMessageSerializer(chunk).data, chunk_size=2))
+        expected = JSONRenderer().render(dict(envelope, results=FastMessageSerializer(rows).data))
+        self.assertEqual(body, expected)
+
+    def test_streamed_compressed_page(self):
+        """Test large message pages are streamed and gzip-compressed"""
+        Message.objects.bulk_create(
+            Message(sender=self.user1, conversation=self.conversation, message_body=f'Bulk {i}')
+            for i in range(60)
+        )
+        client = APIClient()
+        client.force_authenticate(self.user1)
+        response = client.get('/api/messages/?page_size=100', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        page = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual(page['count'], 63)
+        self.assertEqual(len(page['results']), 63)
+
+    def test_zstd_preferred_with_gzip_fallback(self):
+        """Test zstd is chosen when accepted and gzip is used without the zstandard package"""
+        Message.objects.bulk_create(
+            Message(sender=self.user1, conversation=self.conversation, message_body=f'Bulk {i}')
+            for i in range(60)
+        )
+        client = APIClient()
+        client.force_authenticate(self.user1)
+        response = client.get('/api/messages/?page_size=100', HTTP_ACCEPT_ENCODING='gzip, zstd')
+        self.assertEqual(response['Content-Encoding'], 'zstd')
+        body = zstandard.ZstdDecompressor().decompressobj().decompress(b''.join(response.streaming_content))
+        self.assertEqual(json.loads(body)['count'], 63)
+        with mock.patch.object(middleware_module, 'zstandard', None):
+            response = client.get('/api/messages/?page_size=100', HTTP_ACCEPT_ENCODING='gzip, zstd')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(b''.join(response.streaming_content)))['count'], 63)
+
+    def test_list_endpoints(self):
+        """Test list endpoints return the fast serializer output"""
+        client = APIClient()
+        client.force_authenticate(self.user1)
+        response = client.get('/api/messages/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        response = client.get('/api/conversations/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results'][0]['messages']), 3)
+
+
+class UserWriteTests(TestCase):
+    """User creation relies on database constraints; bulk import batches its checks"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@example.com',
+            password='testpass123',
+            role='admin',
+            is_staff=True
+        )
+        self.payload = {
+            'username': 'newuser',
+            'email': 'new@example.com',
+            'role': 'guest',
+            'password_hash': 'hash',
+        }
+
+    def test_create_duplicate_email(self):
+        """Test a duplicate email is reported as a field error"""
+        serializer = UserSerializer(data=dict(self.payload, email='admin@example.com'))
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+        self.assertIn('email', ctx.exception.detail)
+
+    def test_update_keeps_own_email(self):
+        """Test updating a user without changing their email succeeds"""
+        serializer = UserSerializer(self.admin, data={'email': 'admin@example.com', 'first_name': 'Ada'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.save().first_name, 'Ada')
+
+    def test_bulk_import(self):
+        """Test bulk import creates all users with a fixed number of queries"""
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        users = [dict(self.payload, username=f'bulk{i}', email=f'bulk{i}@example.com') for i in range(50)]
+        # The two lookups, plus the insert in its own savepoint
+        with self.assertNumQueries(5):
+            response = client.post('/api/users/import/', users, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 50)
+        self.assertEqual(User.objects.filter(username__startswith='bulk').count(), 50)
+
+    def test_bulk_import_conflicts(self):
+        """Test bulk import rejects existing and repeated emails"""
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        users = [
+            dict(self.payload, username='a', email='admin@example.com'),
+            dict(self.payload, username='b', email='dup@example.com'),
+            dict(self.payload, username='c', email='dup@example.com'),
+        ]
+        response = client.post('/api/users/import/', users, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data['email']), 2)
+        self.assertFalse(User.objects.filter(username__in=['a', 'b', 'c']).exists())
+
+    @override_settings(USER_IMPORT_MAX_USERS=2)
+    def test_bulk_import_limit(self):
+        """Test lists longer than USER_IMPORT_MAX_USERS are rejected"""
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        users = [dict(self.payload, username=f'bulk{i}', email=f'bulk{i}@example.com') for i in range(3)]
+        response = client.post('/api/users/import/', users, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(User.objects.filter(username__startswith='bulk').exists())
+
+    def test_bulk_import_concurrent_conflict(self):
+        """Test a user created after validation gives a field error and no partial import"""
+        users = [dict(self.payload, username=f'bulk{i}', email=f'bulk{i}@example.com') for i in range(3)]
+        serializer = UserSerializer(data=users, many=True)
+        self.assertTrue(serializer.is_valid())
+        User.objects.create(username='other', email='bulk2@example.com', role='guest')
+        with self.assertRaises(ValidationError) as ctx:
+            serializer.save()
+        self.assertIn('email', ctx.exception.detail)
+        self.assertFalse(User.objects.filter(username__startswith='bulk').exists())
+
+
+class MessageCountStrategyTests(TestCase):
+    """Paginated message lists can skip or cache the exact count"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='counter',
+            email='counter@example.com',
+            password='testpass123',
+            role='guest'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        Message.objects.bulk_create(
+            Message(sender=self.user, conversation=self.conversation, message_body=f'Count {i}')
+            for i in range(5)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(MESSAGE_COUNT_STRATEGY='none')
+    def test_none(self):
+        """Test the count is omitted and paging still works"""
+        self.client.get('/api/messages/')  # load the membership cache
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/messages/?page_size=2&page=2')
+        self.assertNotIn('count', response.data)
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+        response = self.client.get('/api/messages/?page_size=2&page=3')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+        response = self.client.get('/api/messages/?page_size=2&page=4')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(MESSAGE_COUNT_STRATEGY='cached')
+    def test_cached(self):
+        """Test the count is cached until a message is written"""
+        self.assertEqual(self.client.get('/api/messages/').data['count'], 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/messages/?page=1').data['count'], 5)
+        Message.objects.create(sender=self.user, conversation=self.conversation, message_body='New')
+        self.assertEqual(self.client.get('/api/messages/').data['count'], 6)
+
+
+class MembershipCacheTests(TestCase):
+    """Conversation membership is cached per user and dropped on changes"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        membership_cache.clear()
+        self.user1 = User.objects.create_user(
+            username='member1',
+            email='member1@example.com',
+            password='testpass123',
+            role='guest'
+        )
+        self.user2 = User.objects.create_user(
+            username='member2',
+            email='member2@example.com',
+            password='testpass123',
+            role='guest'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user1, self.user2)
+
+    def test_cached(self):
+        """Test a second lookup does not query the database"""
+        ids = membership_cache.conversation_ids(self.user1.pk)
+        self.assertEqual(ids, {self.conversation.pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(membership_cache.conversation_ids(self.user1.pk), ids)
+        membership_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(membership_cache.conversation_ids(self.user1.pk), ids)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_backend_not_cached(self):
+        """Test a local-memory cache backend makes every lookup query the database"""
+        self.assertFalse(membership_cache.shared)
+        membership_cache.conversation_ids(self.user1.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(membership_cache.conversation_ids(self.user1.pk), {self.conversation.pk})
+
+    def test_invalidation(self):
+        """Test adds, removes, clears and deletes drop the cached sets"""
+        other = Conversation.objects.create()
+        membership_cache.conversation_ids(self.user1.pk)
+        self.user1.conversations.add(other)
+        self.assertEqual(membership_cache.conversation_ids(self.user1.pk), {self.conversation.pk, other.pk})
+        self.conversation.participants.remove(self.user1)
+        self.assertEqual(membership_cache.conversation_ids(self.user1.pk), {other.pk})
+        membership_cache.conversation_ids(self.user2.pk)
+        self.conversation.participants.clear()
+        self.assertEqual(membership_cache.conversation_ids(self.user2.pk), frozenset())
+        other.delete()
+        self.assertEqual(membership_cache.conversation_ids(self.user1.pk), frozenset())
+
+    def test_invalidated_again_on_commit(self):
+        """Test a set cached before the commit is dropped when it commits"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.conversation.participants.remove(self.user1)
+            # Stands in for a concurrent request caching the pre-commit state
+            membership_cache.conversation_ids(self.user1.pk)
+            version = cache.get(membership_cache.version_key(self.user1.pk))
+        self.assertNotEqual(cache.get(membership_cache.version_key(self.user1.pk)), version)
+
+    def test_access_filtering(self):
+        """Test list queries filter on the cached ids without joining participants"""
+        Message.objects.create(sender=self.user2, conversation=self.conversation, message_body='Hi')
+        Conversation.objects.create().participants.add(self.user2)
+        client = APIClient()
+        client.force_authenticate(self.user1)
+        self.assertEqual(client.get('/api/messages/').data['count'], 1)
+        self.assertEqual(client.get('/api/conversations/').data['count'], 1)
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/api/messages/')
+        self.assertFalse(any('chats_conversation_participants' in query['sql'] for query in queries))
+        self.assertEqual(client.get(f'/api/conversations/{self.conversation.pk}/').status_code, status.HTTP_200_OK)
+        self.conversation.participants.remove(self.user1)
+        self.assertEqual(client.get('/api/messages/').data['count'], 0)
+
+
+class ParticipantManagementTests(TestCase):
+    """Participants are added and removed in bulk with a constant number of queries"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.owner = User.objects.create_user(
+            username='owner',
+            email='owner@example.com',
+            password='testpass123',
+            role='host'
+        )
+        self.members = User.objects.bulk_create(
+            User(username=f'member{i}', email=f'member{i}@example.com', role='guest', password='!')
+            for i in range(300)
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.owner)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f'/api/conversations/{self.conversation.pk}/'
+
+    def post(self, action, user_ids):
+        return self.client.post(f'{self.url}{action}/', {'user_ids': [str(pk) for pk in user_ids]}, format='json')
+
+    def test_bulk_add_and_remove(self):
+        """Test the query count does not grow with the number of users"""
+        ids = [user.pk for user in self.members]
+        self.client.get(self.url)  # load the membership cache
+        with self.assertNumQueries(4):
+            response = self.post('add_participants', ids)
+        self.assertEqual(response.data, {'added': 300})
+        self.assertEqual(self.post('add_participants', ids[:10]).data, {'added': 0})
+        self.assertEqual(self.conversation.participants.count(), 301)
+        self.assertIn(self.conversation.pk, membership_cache.conversation_ids(ids[0]))
+
+        with self.assertNumQueries(4):
+            response = self.post('remove_participants', ids[:200])
+        self.assertEqual(response.data, {'removed': 200})
+        self.assertEqual(self.conversation.participants.count(), 101)
+        self.assertNotIn(self.conversation.pk, membership_cache.conversation_ids(ids[0]))
+
+    def test_unknown_user(self):
+        """Test unknown or malformed ids are rejected without changes"""
+        response = self.post('add_participants', [self.members[0].pk, '00000000-0000-0000-0000-000000000000'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('user_ids', response.data)
+        self.assertEqual(self.post('add_participants', ['nope']).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.conversation.participants.count(), 1)
+
+    def test_remove_participant(self):
+        """Test the single-user action is routed and validates its input"""
+        self.conversation.participants.add(self.members[0])
+        response = self.client.post(f'{self.url}remove_participant/', {'user_id': str(self.members[0].pk)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.conversation.participants.all()), [self.owner])
+        response = self.client.post(f'{self.url}remove_participant/', {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_serializer_update(self):
+        """Test updating participants validates and diffs in constant queries"""
+        ids = [str(user.pk) for user in self.members]
+        serializer = ConversationSerializer(self.conversation, data={'participants': ids[:150]}, partial=True)
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+        serializer.save()
+        serializer = ConversationSerializer(self.conversation, data={'participants': ids[100:]}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        with self.assertNumQueries(6):
+            serializer.save()
+        self.assertEqual({str(pk) for pk in self.conversation.participants.values_list('pk', flat=True)}, set(ids[100:]))
+
+
+class ReadMarkerTests(TestCase):
+    """Read state is a per-conversation watermark with indexed unread counts"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.reader = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='testpass123',
+            role='guest'
+        )
+        self.writer = User.objects.create_user(
+            username='writer',
+            email='writer@example.com',
+            password='testpass123',
+            role='guest'
+        )
+        self.first = Conversation.objects.create()
+        self.second = Conversation.objects.create()
+        self.first.participants.add(self.reader, self.writer)
+        self.second.participants.add(self.reader, self.writer)
+        now = timezone.now()
+        Message.objects.bulk_create(
+            Message(sender=self.writer, conversation=self.first, message_body=f'First {i}') for i in range(5)
+        )
+        for i, message in enumerate(Message.objects.order_by('message_body')):
+            message.sent_at = now - timedelta(minutes=10 - i)
+            message.save(update_fields=['sent_at'])
+        Message.objects.create(sender=self.reader, conversation=self.first, message_body='Own')
+        Message.objects.create(sender=self.writer, conversation=self.second, message_body='Second')
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def unread(self):
+        return self.client.get('/api/conversations/unread/').data
+
+    def test_unread_counts(self):
+        """Test counts exclude own messages and follow the watermark"""
+        self.assertEqual(self.unread(), {str(self.first.pk): 5, str(self.second.pk): 1})
+        third = Message.objects.get(message_body='First 2')
+        response = self.client.post('/api/conversations/mark_read/', [
+            {'conversation': str(self.first.pk), 'read_up_to': third.sent_at.isoformat()},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.unread(), {str(self.first.pk): 2, str(self.second.pk): 1})
+        response = self.client.get(f'/api/conversations/unread/?conversation={self.second.pk}')
+        self.assertEqual(response.data, {str(self.second.pk): 1})
+
+    def test_mark_read_latest_and_forward_only(self):
+        """Test marking without a timestamp reads everything and watermarks never move back"""
+        response = self.client.post('/api/conversations/mark_read/', [
+            {'conversation': str(self.first.pk)}, {'conversation': str(self.second.pk)},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.unread(), {str(self.first.pk): 0, str(self.second.pk): 0})
+        self.client.post('/api/conversations/mark_read/', [
+            {'conversation': str(self.first.pk), 'read_up_to': (timezone.now() - timedelta(days=1)).isoformat()},
+        ], format='json')
+        self.assertEqual(self.unread()[str(self.first.pk)], 0)
+        self.assertEqual(self.reader.read_markers.count(), 2)
+
+    def test_mark_read_conditional_upsert(self):
+        """Test one call creates new markers and only moves existing ones forward"""
+        earlier = timezone.now() - timedelta(hours=2)
+        mark_read(self.reader.pk, {self.first.pk: earlier})
+        watermarks = mark_read(self.reader.pk, {self.first.pk: earlier - timedelta(hours=1), self.second.pk: earlier})
+        self.assertEqual(watermarks, {self.first.pk: earlier, self.second.pk: earlier})
+        watermarks = mark_read(self.reader.pk, {self.first.pk: earlier + timedelta(hours=1)})
+        self.assertEqual(watermarks, {self.first.pk: earlier + timedelta(hours=1)})
+
+    def test_mark_read_future_clamped(self):
+        """Test a future read_up_to is stored as now, so later messages are unread"""
+        before = timezone.now()
+        response = self.client.post('/api/conversations/mark_read/', [
+            {'conversation': str(self.first.pk), 'read_up_to': (before + timedelta(days=365)).isoformat()},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        marker = self.reader.read_markers.get(conversation=self.first)
+        self.assertTrue(before <= marker.last_read_at <= timezone.now())
+        Message.objects.create(sender=self.writer, conversation=self.first, message_body='Later')
+        self.assertEqual(self.unread()[str(self.first.pk)], 1)
+
+    def test_mark_read_requires_participation(self):
+        """Test conversations the user is not in are rejected"""
+        other = Conversation.objects.create()
+        response = self.client.post('/api/conversations/mark_read/', [{'conversation': str(other.pk)}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+_handled = []
+
+
+@task(name='tests.collect', batch=True)
+def collect(payloads):
+    _handled.append(sorted(payload['n'] for payload in payloads))
+
+
+@task(name='tests.flaky', max_attempts=2)
+def flaky(n):
+    raise RuntimeError(f'flaky {n}')
+
+
+@override_settings(TASK_RETRY_BACKOFF=0)
+class BackgroundTaskTests(TestCase):
+    """Queued side effects run in run_task_worker, batched and retried"""
+
+    def setUp(self):
+        """Set up test data"""
+        _handled.clear()
+        self.user = User.objects.create_user(
+            username='queued',
+            email='queued@example.com',
+            password='testpass123',
+            role='guest'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+
+    def run_worker(self):
+        call_command('run_task_worker', threads=1, once=True, stdout=StringIO())
+
+    def test_message_create_enqueues_after_commit(self):
+        """Test posting a message queues message_created only on commit"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = client.post('/api/messages/', {'conversation': str(self.conversation.pk), 'message_body': 'Hi'})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertFalse(BackgroundTask.objects.exists())
+        for callback in callbacks:
+            callback()
+        queued = BackgroundTask.objects.get()
+        self.assertEqual(queued.name, 'chats.tasks.message_created')
+        self.assertEqual(queued.payload['message_id'], response.data['message_id'])
+        self.run_worker()
+        self.assertFalse(BackgroundTask.objects.exists())
+
+    def test_batching(self):
+        """Test a batch handler gets all claimed payloads in one call"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for n in range(3):
+                collect.delay(n=n)
+        self.run_worker()
+        self.assertEqual(_handled, [[0, 1, 2]])
+        self.assertFalse(BackgroundTask.objects.exists())
+
+    def test_retries(self):
+        """Test failures are retried and kept once max_attempts is reached"""
+        with self.captureOnCommitCallbacks(execute=True):
+            flaky.delay(n=1)
+        self.run_worker()
+        failed = BackgroundTask.objects.get()
+        self.assertEqual(failed.status, BackgroundTask.FAILED)
+        self.assertEqual(failed.attempts, 2)
+        self.assertIn('flaky 1', failed.last_error)
+
+    def test_expired_lease_counts_as_attempt(self):
+        """Test a task whose worker died is retried, then failed after max_attempts"""
+        with self.captureOnCommitCallbacks(execute=True):
+            collect.delay(n=1)
+        for attempt in range(1, 6):
+            crashed = claim('dead-worker', 10, lease=timedelta(seconds=-1))
+            self.assertEqual(len(crashed), 1)
+            self.assertEqual(crashed[0].attempts, attempt - 1)
+        self.assertEqual(claim('worker', 10), [])
+        failed = BackgroundTask.objects.get()
+        self.assertEqual(failed.status, BackgroundTask.FAILED)
+        self.assertEqual(failed.attempts, 5)
+        self.assertIn('Lease expired', failed.last_error)
+
+
+class MessageWriterTests(TestCase):
+    """The single writer inserts concurrent messages in one transaction"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username='writer',
+            email='writer@example.com',
+            password='testpass123',
+            role='guest'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+
+    def pending(self, body):
+        return Message(sender=self.user, conversation=self.conversation, message_body=body), Future()
+
+    def test_batch_insert(self):
+        """Test a batch is one message insert and one task insert"""
+        batch = [self.pending(f'Batched {i}') for i in range(3)]
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            MessageWriter().write(batch)
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual([future.result().message_body for _, future in batch], ['Batched 0', 'Batched 1', 'Batched 2'])
+        self.assertTrue(all(future.result().sent_at for _, future in batch))
+        self.assertEqual(Message.objects.count(), 3)
+        self.assertEqual(BackgroundTask.objects.filter(name='chats.tasks.message_created').count(), 3)
+
+    def test_bad_message_fails_alone(self):
+        """Test a failing message fails its own future only"""
+        good, bad = self.pending('Good'), self.pending(None)
+        MessageWriter().write([good, bad])
+        self.assertEqual(good[1].result().message_body, 'Good')
+        with self.assertRaises(IntegrityError):
+            bad[1].result()
+        self.assertEqual(list(Message.objects.values_list('message_body', flat=True)), ['Good'])
+
+    def test_writer_survives_failed_batch(self):
+        """Test an error outside write fails its batch and the thread keeps going"""
+        calls = []
+
+        class FlakyWriter(MessageWriter):
+            def write(self, batch):
+                calls.append(len(batch))
+                if len(calls) == 1:
+                    raise RuntimeError('connection lost')
+                for message, future in batch:
+                    future.set_result(message)
+
+        writer = FlakyWriter()
+        first, second = self.pending('First')[0], self.pending('Second')[0]
+        with self.assertRaisesMessage(RuntimeError, 'connection lost'):
+            writer.save(first)
+        self.assertIs(writer.save(second), second)
+
+    @override_settings(MESSAGE_WRITE_BATCH_TIMEOUT=0.05)
+    def test_writer_timeout(self):
+        """Test a stalled writer times requests out and skips the withdrawn messages"""
+        release = threading.Event()
+        written = []
+
+        class StalledWriter(MessageWriter):
+            def write(self, batch):
+                release.wait(5)
+                for message, future in batch:
+                    written.append(message.message_body)
+                    future.set_result(message)
+
+        writer = StalledWriter()
+        for body in ('Stalled', 'Queued'):
+            with self.assertRaises(TimeoutError):
+                writer.save(self.pending(body)[0])
+        release.set()
+        self.assertEqual(writer.save(self.pending('After')[0]).message_body, 'After')
+        self.assertEqual(written, ['Stalled', 'After'])
+
+    def test_sqlite_profile_pragmas(self):
+        """Test settings_sqlite connections open in WAL mode with the profile's pragmas"""
+        with tempfile.TemporaryDirectory() as directory:
+            handler = ConnectionHandler({'default': dict(
+                settings_sqlite.DATABASES['default'], NAME=os.path.join(directory, 'profile.sqlite3'))})
+            profile = handler['default']
+            try:
+                with profile.cursor() as cursor:
+                    pragmas = {}
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                        cursor.execute(f'PRAGMA {name}')
+                        pragmas[name] = cursor.fetchone()[0]
+            finally:
+                profile.close()
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 20000,
+                                   'mmap_size': settings_sqlite.SQLITE_PRAGMAS['mmap_size']})
+        self.assertEqual(profile.transaction_mode, 'IMMEDIATE')
+
+    @pytest.mark.benchmark
+    def test_sqlite_profile_under_load(self):
+        """Test the SQLite profile runs in WAL mode and serves concurrent posts"""
+        out = StringIO()
+        call_command('benchmark_sqlite_concurrency', 'messaging_app.settings_sqlite',
+                     threads=2, duration=0.5, stdout=out)
+        self.assertIn('0 errors, journal_mode=wal', out.getvalue())
+        self.assertIn('POST', out.getvalue())
+
+
+class MessageArchiveTests(TestCase):
+    """Old messages move to the archive and stay readable on request"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username='archivist',
+            email='archivist@example.com',
+            password='testpass123',
+            role='guest'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.user)
+        for i in range(3):
+            Message.objects.create(sender=self.user, conversation=self.conversation, message_body=f'Old {i}')
+        Message.objects.update(sent_at=timezone.now() - timedelta(days=400))
+        self.recent = Message.objects.create(sender=self.user, conversation=self.conversation, message_body='Recent')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_archive_and_read_back(self):
+        """Test archive_messages moves old rows and ?include_archived=true reads them"""
+        old = Message.objects.exclude(pk=self.recent.pk).first()
+        cache.set(MESSAGE_COUNT_GENERATION_KEY, 0, None)
+        call_command('archive_messages', older_than_days=365, batch_size=2, stdout=StringIO())
+        # Counts are invalidated once per batch, not once per message
+        self.assertEqual(cache.get(MESSAGE_COUNT_GENERATION_KEY), 2)
+        self.assertEqual(list(Message.objects.all()), [self.recent])
+        self.assertEqual(ArchivedMessage.objects.count(), 3)
+
+        self.assertEqual(self.client.get('/api/messages/').data['count'], 1)
+        response = self.client.get('/api/messages/?include_archived=true&fields=message_body')
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(response.data['results'][0], {'message_body': 'Recent'})
+
+        response = self.client.get(f'/api/messages/{old.message_id}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(f'/api/messages/{old.message_id}/?include_archived=true')
+        self.assertEqual(response.data['message_body'], old.message_body)
+
+
+class LoadDataCommandTests(TestCase):
+    """The synthetic data generator creates consistent rows"""
+
+    def test_generate_load_data(self):
+        """Test counts, participant bounds and timestamp window"""
+        call_command(
+            'generate_load_data', users=30, conversations=10, messages=200, min_participants=2,
+            max_participants=5, days=30, batch_size=64, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Message.objects.count(), 200)
+        for conversation in Conversation.objects.all():
+            self.assertTrue(2 <= conversation.participants.count() <= 5)
+        message = Message.objects.select_related('conversation').first()
+        self.assertIn(message.sender, message.conversation.participants.all())
+        self.assertGreater(Message.objects.order_by('sent_at').first().sent_at, timezone.now() - timedelta(days=31))
+        self.assertLess(Message.objects.order_by('sent_at').first().sent_at, timezone.now() - timedelta(days=1))
+        # Keys are time-ordered like production keys and follow sent_at
+        self.assertEqual({message_id.version for message_id in Message.objects.values_list('pk', flat=True)}, {7})
+        self.assertEqual(list(Message.objects.order_by('pk').values_list('sent_at', flat=True)),
+                         list(Message.objects.order_by('sent_at').values_list('sent_at', flat=True)))
+        # User keys follow creation order whatever the clock does
+        self.assertEqual([int(name) for name in User.objects.order_by('pk').values_list('last_name', flat=True)],
+                         list(range(30)))
+
+
+class StartupCommandTests(TestCase):
+    """measure_startup boots settings modules in fresh interpreters"""
+
+    @pytest.mark.benchmark
+    def test_measure_startup(self):
+        """Test the API-only profile boots and loads fewer modules"""
+        out = StringIO()
+        call_command('measure_startup', 'messaging_app.settings', 'messaging_app.settings_api',
+                     runs=1, top=3, stdout=out)
+        lines = [line for line in out.getvalue().splitlines() if 'MiB RSS' in line]
+        self.assertEqual(len(lines), 2)
+        full, api = (int(line.split(', ')[-1].split()[0]) for line in lines)
+        self.assertLess(api, full)
+
+
 @pytest.mark.django_db
 class APITests:
     """Test cases for API endpoints"""
@@ -1,12 +1,13 @@
 from django.urls import path, include
 from rest_framework_nested import routers
 
-from .views import ConversationViewSet, MessageViewSet 
+from .views import ConversationViewSet, MessageViewSet, UserViewSet
 
 # Create a router and register our ViewSets with it.
 router = routers.SimpleRouter()
 router.register(r'conversations', ConversationViewSet, basename='conversation')
 router.register(r'messages', MessageViewSet, basename='message')
+router.register(r'users', UserViewSet, basename='user')
 
 # Create a nested router for messages within conversations
 nested_router = routers.NestedSimpleRouter(router, r'conversations', lookup='conversation')
@@ -1,19 +1,83 @@
-from rest_framework import viewsets, status
+import uuid
+
+from rest_framework import serializers, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import models
-from .models import Conversation, Message, User
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from .membership import bulk_add_participants, bulk_remove_participants, conversation_filter, membership_cache
+from .models import ArchivedMessage, Conversation, Message, User
 from .serializers import (
     ConversationSerializer, 
     MessageSerializer, 
+    ExpandedMessageSerializer,
+    FastConversationSerializer,
+    FastMessageSerializer,
+    ParticipantIdsSerializer,
+    ReadMarkerSerializer,
+    UserSerializer,
 )
 from .permissions import IsParticipantOfConversation, IsOwnerOrReadOnly
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 
 from .pagination import MessageResultsSetPagination
+from .receipts import mark_read, unread_counts
+from .tasks import message_created, message_payload
+from .writer import message_writer
+
+
+class SparseFieldsViewMixin:
+    """
+    Handle ``?fields=a,b`` on reads: validate the names against the fast
+    serializer, pass them on to the serializer and load only the matching
+    columns with ``.only()``.
+    """
+    fast_serializer_class = None
+
+    def requested_fields(self):
+        """Return the requested field names, or None when all fields are wanted."""
+        if self.request.method != 'GET' or 'fields' not in self.request.query_params:
+            return None
+        fields = [name for name in self.request.query_params['fields'].split(',') if name]
+        unknown = sorted(set(fields) - set(self.fast_serializer_class.field_names))
+        if unknown:
+            raise ValidationError({'fields': [f"Unknown field: {name}" for name in unknown]})
+        return fields
+
+    def narrow_queryset(self, queryset):
+        """Defer the model columns that no requested field needs."""
+        fields = self.requested_fields()
+        if fields is None:
+            return queryset
+        columns = {field.name for field in queryset.model._meta.concrete_fields}
+        return queryset.only(*[name for name in fields if name in columns])
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+class UserViewSet(viewsets.GenericViewSet):
+    queryset = User.objects.all()
+    serializer_class = UserSerializer
+    permission_classes = [IsAuthenticated, IsAdminUser]
 
-class ConversationViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """Create many users at once from a list of user objects."""
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ConversationViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Conversation.objects.all()
     serializer_class = ConversationSerializer
     permission_classes = [IsAuthenticated, IsParticipantOfConversation]
@@ -22,11 +86,21 @@ class ConversationViewSet(viewsets.ModelViewSet):
     search_fields = ['participants__username', 'participants__email']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
+    fast_serializer_class = FastConversationSerializer
     
     def get_queryset(self):
         """Filter conversations by participant if user_id is provided."""
          # Only return conversations where the current user is a participant
-        return Conversation.objects.filter(participants=self.request.user)
+        return self.narrow_queryset(Conversation.objects.filter(conversation_filter(self.request.user, 'pk')))
+
+    def list(self, request, *args, **kwargs):
+        """List conversations through the read-only fast serializer."""
+        fields = self.requested_fields()
+        rows = self.filter_queryset(self.get_queryset()).values_list(*FastConversationSerializer.columns_for(fields))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(FastConversationSerializer(page, fields).data)
+        return Response(FastConversationSerializer(rows, fields).data)
 
     def perform_create(self, serializer):
         """Automatically add the current user as a participant when creating a conversation."""
@@ -34,6 +108,53 @@ class ConversationViewSet(viewsets.ModelViewSet):
         conversation.participants.add(self.request.user)
         
     
+    def participant_ids(self, request):
+        """Validate ``user_ids`` from the request body and return them as pks."""
+        serializer = ParticipantIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return [user.pk for user in serializer.validated_data['user_ids']]
+
+    @action(detail=True, methods=['post'])
+    def add_participants(self, request, pk=None):
+        """Add every user in ``user_ids`` to the conversation."""
+        conversation = self.get_object()
+        added = bulk_add_participants(conversation.pk, self.participant_ids(request))
+        return Response({'added': len(added)})
+
+    @action(detail=True, methods=['post'])
+    def remove_participants(self, request, pk=None):
+        """Remove every user in ``user_ids`` from the conversation."""
+        conversation = self.get_object()
+        removed = bulk_remove_participants(conversation.pk, self.participant_ids(request))
+        return Response({'removed': len(removed)})
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """Move the user's read watermarks forward for a list of conversations."""
+        serializer = ReadMarkerSerializer(data=request.data, many=True, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        watermarks = mark_read(request.user.pk, {
+            item['conversation']: item.get('read_up_to') for item in serializer.validated_data
+        })
+        return Response([
+            {'conversation': str(conversation_id), 'last_read_at': serializers.DateTimeField().to_representation(read_at)}
+            for conversation_id, read_at in watermarks.items()
+        ])
+
+    @action(detail=False, methods=['get'])
+    def unread(self, request):
+        """Unread message counts for the user's conversations, or those in ?conversation=a,b."""
+        conversation_ids = membership_cache.conversation_ids(request.user.pk)
+        if 'conversation' in request.query_params:
+            try:
+                wanted = {uuid.UUID(value) for value in request.query_params['conversation'].split(',') if value}
+            except ValueError:
+                raise ValidationError({'conversation': ["Must be a comma separated list of UUIDs."]})
+            conversation_ids = conversation_ids & wanted
+        counts = unread_counts(request.user.pk, sorted(conversation_ids))
+        return Response({str(conversation_id): count for conversation_id, count in counts.items()})
+
+    @action(detail=True, methods=['post'])
     def remove_participant(self, request, pk=None):
         """Remove a participant from a conversation."""
         conversation = self.get_object()
@@ -42,21 +163,21 @@ class ConversationViewSet(viewsets.ModelViewSet):
         if not user_id:
             return Response(
                 {'error': 'user_id is required'}, 
-                status=status.HTTP_40_BAD_REQUEST
+                status=status.HTTP_400_BAD_REQUEST
             )
         
         try:
             user = User.objects.get(user_id=user_id)
             conversation.participants.remove(user)
             return Response({'message': 'Participant removed successfully'})
-        except User.DoesNotExist:
+        except (User.DoesNotExist, DjangoValidationError):
             return Response(
                 {'error': 'User not found'}, 
                 status=status.HTTP_404_NOT_FOUND
             )
 
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(SparseFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
@@ -66,14 +187,85 @@ class MessageViewSet(viewsets.ModelViewSet):
     ordering_fields = ['sent_at']
     ordering = ['-sent_at']
     pagination_class = MessageResultsSetPagination
+    fast_serializer_class = FastMessageSerializer
+    # JSON pages with at least this many rows are streamed in chunks
+    stream_threshold = 50
     
     def get_queryset(self):
         """Filter messages to only show those the user has access to."""
+        return self.accessible_messages(Message)
+
+    def get_archived_queryset(self):
+        """Archived messages the user has access to."""
+        return self.accessible_messages(ArchivedMessage)
+
+    def accessible_messages(self, model):
         # Return messages where the user is either the sender or a participant in the conversation
-        return Message.objects.filter(
-            models.Q(sender=self.request.user) | 
-            models.Q(conversation__participants=self.request.user)).distinct()
+        queryset = model.objects.filter(
+            models.Q(sender=self.request.user) |
+            conversation_filter(self.request.user))
+        if self.expand_sender():
+            queryset = queryset.select_related('sender')
+        return self.narrow_queryset(queryset)
+
+    def include_archived(self):
+        """Whether the request asked for ?include_archived=true."""
+        return self.request.query_params.get('include_archived', '').lower() in ('1', 'true', 'yes')
+
+    def get_object(self):
+        """Fall back to the archive on reads with ?include_archived=true."""
+        try:
+            return super().get_object()
+        except Http404:
+            if self.request.method != 'GET' or not self.include_archived():
+                raise
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_archived_queryset())
+        obj = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    def expand_sender(self):
+        """Whether the request asked for ?expand=sender and the sender field is included."""
+        fields = self.requested_fields()
+        return ('sender' in self.request.query_params.get('expand', '').split(',')
+                and (fields is None or 'sender' in fields))
+
+    def get_serializer_class(self):
+        """Embed the sender on reads when ?expand=sender is given."""
+        if self.request.method == 'GET' and self.expand_sender():
+            return ExpandedMessageSerializer
+        return super().get_serializer_class()
+
+    def list(self, request, *args, **kwargs):
+        """List messages through the read-only fast serializer."""
+        expand_sender = self.expand_sender()
+        fields = self.requested_fields()
+        columns = FastMessageSerializer.columns_for(expand_sender, fields)
+        rows = self.filter_queryset(self.get_queryset())
+        if self.include_archived():
+            # Union with the archive, ordered like the live query; ordering
+            # columns the serializer does not need are appended at the end.
+            ordering = rows.query.order_by
+            columns += [name.lstrip('-') for name in ordering if name.lstrip('-') not in columns]
+            archived = self.filter_queryset(self.get_archived_queryset()).values_list(*columns)
+            rows = rows.values_list(*columns).order_by().union(archived.order_by(), all=True).order_by(*ordering)
+        else:
+            rows = rows.values_list(*columns)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            if type(request.accepted_renderer) is JSONRenderer and len(page) >= self.stream_threshold:
+                return self.paginator.get_streaming_response(
+                    page, lambda chunk: FastMessageSerializer(chunk, expand_sender, fields).data)
+            return self.get_paginated_response(FastMessageSerializer(page, expand_sender, fields).data)
+        return Response(FastMessageSerializer(rows, expand_sender, fields).data)
     
     def perform_create(self, serializer):
         """Automatically set the sender to the current user when creating a message."""
-        serializer.save(sender=self.request.user)
\ No newline at end of file
+        if getattr(settings, 'MESSAGE_WRITE_BATCHING', False):
+            # Committed by the writer thread together with concurrent requests' messages
+            serializer.instance = message_writer.save(Message(sender=self.request.user, **serializer.validated_data))
+            return
+        message = serializer.save(sender=self.request.user)
+        # Side effects run in run_task_worker, after the message is committed
+        message_created.delay(**message_payload(message))
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Single-writer queue for message inserts.
+
+SQLite takes one writer at a time, so concurrent requests inserting
+messages queue on the database lock and each pays for its own commit.
+With MESSAGE_WRITE_BATCHING on, a request hands its unsaved Message to
+the process's writer thread instead. The thread inserts everything queued
+at that moment in one transaction and then wakes the waiting requests.
+
+Batches only form within one process. Under gunicorn, run threaded
+workers (GUNICORN_THREADS) so that concurrent requests share a writer.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, router, transaction
+from django.db.models.signals import post_save
+
+from .models import Message
+from .tasks import message_created, message_payload
+
+
+class MessageWriter:
+    """Inserts messages from many request threads on one writer thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    def save(self, message):
+        """
+        Insert an unsaved message and return it once its batch has committed.
+        Raises TimeoutError after MESSAGE_WRITE_BATCH_TIMEOUT seconds.
+        """
+        future = Future()
+        self._ensure_thread().put((message, future))
+        try:
+            return future.result(getattr(settings, 'MESSAGE_WRITE_BATCH_TIMEOUT', 30))
+        except TimeoutError:
+            # Withdraw it if still queued, so it is not written after the request failed
+            future.cancel()
+            raise
+
+    def _ensure_thread(self):
+        # Threads do not survive fork, and gunicorn's preload_app imports this
+        # module in the master, so start a writer per process on first use
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._queue = queue.SimpleQueue()
+                    threading.Thread(target=self._run, args=(self._queue,), name='message-writer',
+                                     daemon=True).start()
+                    self._pid = pid
+        return self._queue
+
+    def _run(self, pending):
+        while True:
+            batch = [pending.get()]
+            size = getattr(settings, 'MESSAGE_WRITE_BATCH_SIZE', 100)
+            deadline = time.monotonic() + getattr(settings, 'MESSAGE_WRITE_BATCH_WAIT', 0.002)
+            while len(batch) < size:
+                try:
+                    batch.append(pending.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            batch = [(message, future) for message, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                close_old_connections()
+                self.write(batch)
+            except Exception as exc:
+                # Keep the thread alive for later batches; this one fails
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def write(self, batch):
+        """
+        Insert ``(message, future)`` pairs in one transaction and resolve the
+        futures. If the batch fails, each message is retried on its own so one
+        bad message only fails its own request.
+        """
+        try:
+            self.insert([message for message, _ in batch])
+        except Exception:
+            for message, future in batch:
+                try:
+                    self.insert([message])
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(message)
+        else:
+            for message, future in batch:
+                future.set_result(message)
+
+    @staticmethod
+    def insert(messages):
+        using = router.db_for_write(Message)
+        with transaction.atomic(using=using):
+            Message.objects.using(using).bulk_create(messages)
+            # bulk_create sends no signals; receivers such as the message
+            # count invalidation expect one per new message
+            for message in messages:
+                post_save.send(sender=Message, instance=message, created=True, update_fields=None,
+                               raw=False, using=using)
+            message_created.delay_many(message_payload(message) for message in messages)
+
+
+message_writer = MessageWriter()
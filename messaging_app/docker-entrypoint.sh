@@ -0,0 +1,7 @@
+#!/bin/sh
+# The database is SQLite inside the container (db.sqlite3 is not copied into
+# the image), so every container starts from an empty file: create the
+# tables before serving.
+set -e
+python manage.py migrate --no-input
+exec "$@"
@@ -0,0 +1,24 @@
+"""
+gunicorn settings for the container image.
+
+The app is imported once in the master (preload_app) and workers are
+forked from it, so imported modules are shared copy-on-write instead of
+loaded again in every worker. gc.freeze() moves those objects out of the
+collector's reach so garbage collection in a worker does not touch, and
+thereby copy, the shared pages.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+# More than one thread per worker lets the SQLite profile's message writer
+# (chats.writer) batch concurrent inserts
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+preload_app = True
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+
+def when_ready(server):
+    gc.freeze()
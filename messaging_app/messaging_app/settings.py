@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'chats.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,6 +88,16 @@ DATABASES = {
     }
 }
 
+# Shared by every worker process on the host: the membership cache relies on
+# invalidations made in one process being seen by the others, which the
+# default local-memory backend cannot do (see chats.membership)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'messaging_app_cache')),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,6 +135,37 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Responses smaller than this many bytes are not compressed
+COMPRESSION_MIN_SIZE = 1024
+
+# Total count for paginated message lists: 'exact', 'cached', 'estimated' or 'none'
+MESSAGE_COUNT_STRATEGY = 'exact'
+MESSAGE_COUNT_CACHE_TTL = 60
+
+# Largest list accepted by the bulk user import endpoint
+USER_IMPORT_MAX_USERS = 1000
+
+# Messages older than this many days are moved to ArchivedMessage by archive_messages
+MESSAGE_RETENTION_DAYS = 365
+
+# Per-user conversation membership cache: users kept in each process's LRU,
+# seconds an entry lives, and the set size above which queries use a subquery
+MEMBERSHIP_CACHE_SIZE = 1024
+MEMBERSHIP_CACHE_TTL = 300
+MEMBERSHIP_CACHE_MAX_IN = 500
+
+# Seconds before the first retry of a failed background task; doubles on each attempt
+TASK_RETRY_BACKOFF = 5
+
+# Insert messages on one writer thread per process, grouping concurrent
+# requests into one transaction (see chats.writer): at most this many
+# messages per batch, waiting this many seconds for more after the first.
+# A request gives up after MESSAGE_WRITE_BATCH_TIMEOUT seconds
+MESSAGE_WRITE_BATCHING = False
+MESSAGE_WRITE_BATCH_SIZE = 100
+MESSAGE_WRITE_BATCH_WAIT = 0.002
+MESSAGE_WRITE_BATCH_TIMEOUT = 30
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -133,6 +177,17 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'chats.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'chats.parsers.MessagePackParser',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
@@ -0,0 +1,46 @@
+"""
+API-only settings for autoscaled workers.
+
+Same as settings.py, minus everything a JSON/MessagePack API does not
+serve: no admin, sessions, flash messages, static files, templates or
+browsable API, and JWT as the only authentication. Fewer apps and
+middleware mean fewer imports at boot and less memory per worker.
+Measure with ``python manage.py measure_startup messaging_app.settings
+messaging_app.settings_api``.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+)]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+)]
+
+ROOT_URLCONF = 'messaging_app.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'chats.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'chats.parsers.MessagePackParser',
+    ],
+}
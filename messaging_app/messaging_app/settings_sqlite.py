@@ -0,0 +1,44 @@
+"""
+Production profile for running the API on SQLite.
+
+Same as settings_api.py, plus per-connection pragmas and batched message
+writes:
+
+- WAL journal: readers no longer block the writer, nor the writer readers.
+- synchronous=NORMAL: with WAL, commits skip the fsync; a power loss can
+  lose the last commits but never corrupts the database.
+- mmap_size: reads are served from the memory-mapped file.
+- Writers wait up to ``timeout`` seconds for the lock rather than failing
+  with "database is locked". Transactions start as BEGIN IMMEDIATE so a
+  reader cannot deadlock by upgrading to a writer halfway through.
+- MESSAGE_WRITE_BATCHING groups concurrent message inserts into one
+  transaction (see chats.writer).
+
+Compare with ``python manage.py benchmark_sqlite_concurrency
+messaging_app.settings_api messaging_app.settings_sqlite``.
+"""
+from .settings_api import *  # noqa: F401,F403
+from .settings_api import DATABASES
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative: KiB
+    'temp_store': 'MEMORY',
+}
+
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            # Run on every new connection
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+    },
+}
+
+MESSAGE_WRITE_BATCHING = True
@@ -0,0 +1,20 @@
+"""
+URL configuration for settings_api: the chats API, JWT endpoints and a
+health check, without the admin or the browsable API login views.
+"""
+from django.http import HttpResponse
+from django.urls import path, include
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+
+def health(request):
+    """Liveness/readiness probe; touches neither the database nor auth."""
+    return HttpResponse('ok', content_type='text/plain')
+
+
+urlpatterns = [
+    path('health/', health, name='health'),
+    path('api/', include('chats.urls')),
+    path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+]
@@ -1,6 +1,8 @@
 import mysql.connector
 
-def stream_users_in_batches(batch_size):
+TABLE_NAME = 'user_data'
+
+def stream_users_in_batches(batch_size, min_age=None):
     conn = mysql.connector.connect(
         host='localhost',
         user='root',
@@ -9,7 +11,11 @@ def stream_users_in_batches(batch_size):
     )
     cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute('SELECT * FROM user_data')
+        if min_age is None:
+            cursor.execute(f'SELECT * FROM {TABLE_NAME}')
+        else:
+            # Filtered by the server, so skipped rows are never sent
+            cursor.execute(f'SELECT * FROM {TABLE_NAME} WHERE age > %s', (min_age,))
         batch = []
         for row in cursor:
             batch.append(row)
@@ -22,10 +28,12 @@ def stream_users_in_batches(batch_size):
         cursor.close()
         conn.close()
 
+def filter_users_over_25(batch):
+    return [user for user in batch if float(user['age']) > 25]  # 2nd loop (list comp)
+
 def batch_processing(batch_size):
-    for batch in stream_users_in_batches(batch_size):  # 1st loop
-        filtered = [user for user in batch if float(user['age']) > 25]  # 2nd loop (list comp)
-        yield filtered
+    for batch in stream_users_in_batches(batch_size, min_age=25):  # 1st loop
+        yield batch
 
 # Example usage (uncomment to test):
 # for batch in batch_processing(10):
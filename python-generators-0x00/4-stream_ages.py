@@ -1,5 +1,7 @@
 import mysql.connector
 
+TABLE_NAME = 'user_data'
+
 def stream_user_ages():
     conn = mysql.connector.connect(
         host='localhost',
@@ -9,7 +11,7 @@ def stream_user_ages():
     )
     cursor = conn.cursor()
     try:
-        cursor.execute('SELECT age FROM user_data')
+        cursor.execute(f'SELECT age FROM {TABLE_NAME}')
         for (age,) in cursor:
             yield float(age)
     finally:
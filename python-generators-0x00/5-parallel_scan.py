@@ -0,0 +1,106 @@
+import mysql.connector
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+def connect():
+    return mysql.connector.connect(
+        host='localhost',
+        user='root',
+        password='',  # Set your MySQL root password here
+        database='ALX_prodev'
+    )
+
+def chunk_ranges(chunk_size):
+    """
+    Yield half-open (low, high) user_id ranges of `chunk_size` rows each, in
+    key order. Each boundary is found by skipping `chunk_size` keys from the
+    previous one, so the whole primary key is walked once, lazily.
+    """
+    conn = connect()
+    cursor = conn.cursor()
+    try:
+        low = None
+        while True:
+            if low is None:
+                cursor.execute('SELECT user_id FROM user_data ORDER BY user_id LIMIT 1 OFFSET %s', (chunk_size,))
+            else:
+                cursor.execute('SELECT user_id FROM user_data WHERE user_id >= %s '
+                               'ORDER BY user_id LIMIT 1 OFFSET %s', (low, chunk_size))
+            row = cursor.fetchone()
+            high = row[0] if row else None
+            yield low, high
+            if high is None:
+                return
+            low = high
+    finally:
+        cursor.close()
+        conn.close()
+
+# One connection per worker process, opened by the pool initializer
+_worker_conn = None
+
+def open_worker_connection():
+    global _worker_conn
+    _worker_conn = connect()
+
+def scan_chunk(low, high, process_batch):
+    """Fetch one key range (at most one chunk of rows) and return process_batch of it."""
+    conditions = []
+    params = []
+    if low is not None:
+        conditions.append('user_id >= %s')
+        params.append(low)
+    if high is not None:
+        conditions.append('user_id < %s')
+        params.append(high)
+    query = 'SELECT * FROM user_data'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+
+    cursor = _worker_conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        return process_batch(cursor.fetchall())
+    finally:
+        cursor.close()
+
+def parallel_scan(process_batch, workers=4, batch_size=1000, ordered=True):
+    """
+    Scan user_data with `workers` processes and yield process_batch of each
+    batch_size-row key range.
+
+    The table is split into many more ranges than workers, so a slow range
+    does not hold up the others, and each task returns a single bounded
+    result. At most 2 * workers ranges are in flight, so memory stays
+    bounded however large the table is. process_batch must be a picklable
+    module-level function. With ordered=True results come back in primary
+    key order; otherwise each is yielded as soon as it is ready.
+    """
+    ranges = chunk_ranges(batch_size)
+    in_flight = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=open_worker_connection) as executor:
+        pending = deque() if ordered else set()
+        for low, high in ranges:
+            future = executor.submit(scan_chunk, low, high, process_batch)
+            if ordered:
+                pending.append(future)
+                if len(pending) >= in_flight:
+                    yield pending.popleft().result()
+            else:
+                pending.add(future)
+                if len(pending) >= in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+        if ordered:
+            while pending:
+                yield pending.popleft().result()
+        else:
+            for future in as_completed(pending):
+                yield future.result()
+
+# Example usage (uncomment to test):
+# if __name__ == '__main__':
+#     filter_users_over_25 = __import__('1-batch_processing').filter_users_over_25
+#     for batch in parallel_scan(filter_users_over_25, workers=4, batch_size=100):
+#         print(batch)
@@ -0,0 +1,104 @@
+import asyncio
+import aiomysql
+
+_pool = None
+
+async def get_pool(maxsize=10):
+    """Return the shared aiomysql pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = await aiomysql.create_pool(
+            host='localhost',
+            user='root',
+            password='',  # Set your MySQL root password here
+            db='ALX_prodev',
+            minsize=1,
+            maxsize=maxsize
+        )
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+async def stream_users():
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.SSDictCursor) as cursor:
+            await cursor.execute('SELECT * FROM user_data')
+            while True:
+                row = await cursor.fetchone()
+                if row is None:
+                    break
+                yield row
+
+async def stream_users_in_batches(batch_size, min_age=None):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.SSDictCursor) as cursor:
+            if min_age is None:
+                await cursor.execute('SELECT * FROM user_data')
+            else:
+                await cursor.execute('SELECT * FROM user_data WHERE age > %s', (min_age,))
+            while True:
+                batch = await cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+
+async def batch_processing(batch_size):
+    async for batch in stream_users_in_batches(batch_size, min_age=25):
+        yield batch
+
+async def paginate_users(page_size, offset):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute('SELECT * FROM user_data LIMIT %s OFFSET %s', (page_size, offset))
+            return await cursor.fetchall()
+
+async def lazy_paginate(page_size):
+    offset = 0
+    while True:
+        page = await paginate_users(page_size, offset)
+        if not page:
+            break
+        yield page
+        offset += page_size
+
+async def concurrent_paginate(page_size, in_flight=4):
+    """
+    Like lazy_paginate, but keeps `in_flight` page fetches running at once
+    with asyncio.gather. Pages are still yielded in order.
+    """
+    offset = 0
+    while True:
+        offsets = [offset + i * page_size for i in range(in_flight)]
+        pages = await asyncio.gather(*(paginate_users(page_size, o) for o in offsets))
+        for page in pages:
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+        offset += in_flight * page_size
+
+async def stream_user_ages():
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.SSCursor) as cursor:
+            await cursor.execute('SELECT age FROM user_data')
+            while True:
+                row = await cursor.fetchone()
+                if row is None:
+                    break
+                yield float(row[0])
+
+# Example usage (uncomment to test):
+# async def main():
+#     async for page in concurrent_paginate(100, in_flight=4):
+#         print(page)
+#     await close_pool()
+# asyncio.run(main())
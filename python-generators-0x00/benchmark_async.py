@@ -0,0 +1,66 @@
+"""
+Compare throughput of the blocking generators with their async counterparts.
+
+Each stream is drained once and reported as rows per second.
+
+    python3 benchmark_async.py --page-size 100 --in-flight 8
+"""
+import argparse
+import asyncio
+import time
+
+stream_users = __import__('0-stream_users').stream_users
+stream_users_in_batches = __import__('1-batch_processing').stream_users_in_batches
+lazy_paginate = __import__('2-lazy_paginate').lazy_paginate
+stream_user_ages = __import__('4-stream_ages').stream_user_ages
+async_streams = __import__('6-async_streams')
+
+
+def report(label, rows, elapsed):
+    print(f"{label:<32} {rows:>10} rows  {elapsed:8.3f}s  {rows / elapsed:10.0f} rows/s")
+
+
+def run_sync(label, rows_in, stream):
+    start = time.perf_counter()
+    rows = sum(rows_in(item) for item in stream)
+    report(label, rows, time.perf_counter() - start)
+
+
+async def run_async(label, rows_in, stream):
+    start = time.perf_counter()
+    rows = 0
+    async for item in stream:
+        rows += rows_in(item)
+    report(label, rows, time.perf_counter() - start)
+
+
+async def run_all_async(args):
+    await async_streams.get_pool(maxsize=args.in_flight)
+    try:
+        await run_async('async stream_users', lambda _: 1, async_streams.stream_users())
+        await run_async('async stream_users_in_batches', len,
+                        async_streams.stream_users_in_batches(args.batch_size))
+        await run_async('async lazy_paginate', len, async_streams.lazy_paginate(args.page_size))
+        await run_async(f'async concurrent_paginate x{args.in_flight}', len,
+                        async_streams.concurrent_paginate(args.page_size, args.in_flight))
+        await run_async('async stream_user_ages', lambda _: 1, async_streams.stream_user_ages())
+    finally:
+        await async_streams.close_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--in-flight', type=int, default=4)
+    args = parser.parse_args()
+
+    run_sync('stream_users', lambda _: 1, stream_users())
+    run_sync('stream_users_in_batches', len, stream_users_in_batches(args.batch_size))
+    run_sync('lazy_paginate', len, lazy_paginate(args.page_size))
+    run_sync('stream_user_ages', lambda _: 1, stream_user_ages())
+    asyncio.run(run_all_async(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Compare the legacy CHAR(36) user_data schema with the binary-key schema.
+
+For each schema a scratch table is loaded with bulk_insert_data, then the
+shipped batch_processing and stream_user_ages generators are pointed at it
+and drained.
+
+    python3 benchmark_schema.py --rows 1000000
+"""
+import argparse
+import time
+import uuid
+
+import seed
+from benchmark_seed import scaled_rows
+
+batch_processing = __import__('1-batch_processing')
+stream_ages = __import__('4-stream_ages')
+
+SCHEMAS = [
+    ('legacy', seed.LEGACY_TABLE_SCHEMA, lambda: str(uuid.uuid4())),
+    ('binary', seed.TABLE_SCHEMA, seed.new_user_id),
+]
+
+
+def drained(stream):
+    """Seconds taken to exhaust ``stream``."""
+    start = time.perf_counter()
+    for _ in stream:
+        pass
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    source = seed.read_csv_data(seed.CSV_FILE)
+    conn = seed.connect_to_prodev()
+    cursor = conn.cursor()
+    try:
+        for label, schema, id_factory in SCHEMAS:
+            table = f"user_data_bench_{label}"
+            seed.TABLE_NAME = batch_processing.TABLE_NAME = stream_ages.TABLE_NAME = table
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(f"CREATE TABLE {table} ({schema})")
+
+            start = time.perf_counter()
+            seed.bulk_insert_data(conn, scaled_rows(source, args.rows), args.batch_size, id_factory=id_factory)
+            insert = time.perf_counter() - start
+
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+            age_filter = drained(batch_processing.batch_processing(args.batch_size))
+            age_scan = drained(stream_ages.stream_user_ages())
+            print(f"{label:<8} insert {args.rows / insert:10.0f} rows/s  "
+                  f"age filter {age_filter:7.3f}s  age scan {age_scan:7.3f}s")
+            cursor.execute(f"DROP TABLE {table}")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
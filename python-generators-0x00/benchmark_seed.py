@@ -0,0 +1,74 @@
+"""
+Compare seed.insert_data against seed.bulk_insert_data.
+
+user_data.csv is repeated until it reaches the requested row count, with a
+numeric suffix on each email so every row stays unique. Both loaders write to
+a scratch table so the real user_data is left untouched.
+
+    python3 benchmark_seed.py --rows 1000000 --naive-rows 10000
+"""
+import argparse
+import itertools
+import time
+
+import seed
+
+BENCH_TABLE = 'user_data_bench'
+
+
+def scaled_rows(rows, count):
+    """Yield `count` rows cycling over `rows` with unique emails."""
+    for i, row in enumerate(itertools.islice(itertools.cycle(rows), count)):
+        local, _, domain = row['email'].partition('@')
+        yield {'name': row['name'], 'email': f"{local}+{i}@{domain}", 'age': row['age']}
+
+
+def reset_table(conn):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {seed.TABLE_NAME}")
+    finally:
+        cursor.close()
+    seed.create_table(conn)
+
+
+def timed(label, count, load):
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} {count:>10} rows  {elapsed:8.2f}s  {count / elapsed:10.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--naive-rows', type=int, default=10_000,
+                        help='rows for insert_data, which is too slow to run at full scale')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--commit-every', type=int, default=10)
+    args = parser.parse_args()
+
+    source = seed.read_csv_data(seed.CSV_FILE)
+    seed.TABLE_NAME = BENCH_TABLE
+    conn = seed.connect_to_prodev()
+    try:
+        reset_table(conn)
+        timed('insert_data', args.naive_rows,
+              lambda: seed.insert_data(conn, list(scaled_rows(source, args.naive_rows))))
+
+        reset_table(conn)
+        timed('bulk_insert_data', args.rows,
+              lambda: seed.bulk_insert_data(conn, scaled_rows(source, args.rows),
+                                            args.batch_size, args.commit_every))
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {seed.TABLE_NAME}")
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
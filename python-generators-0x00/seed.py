@@ -1,5 +1,9 @@
 import csv
-import uuid
+import os
+import queue
+import threading
+import time
+from decimal import Decimal, InvalidOperation
 import mysql.connector
 from mysql.connector import errorcode
 
@@ -7,6 +11,10 @@ DB_NAME = 'ALX_prodev'
 TABLE_NAME = 'user_data'
 CSV_FILE = 'user_data.csv'
 
+# Ages outside this range are treated as bad rows by stream_csv_batches
+MIN_AGE = 0
+MAX_AGE = 150
+
 # 1. Connect to MySQL server (no DB specified)
 def connect_db():
     return mysql.connector.connect(
@@ -32,34 +40,102 @@ def connect_to_prodev():
         database=DB_NAME
     )
 
+# Binary, time-ordered primary key. SELECT age scans (stream_user_ages) read
+# only the small age index. Age filters fetching whole rows (batch_processing)
+# use it as a range only when few rows match; otherwise MySQL scans the table.
+TABLE_SCHEMA = '''
+    user_id BINARY(16) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    age DECIMAL NOT NULL,
+    UNIQUE KEY uniq_email (email),
+    INDEX idx_age (age)
+'''
+
+# Original schema, kept for migrate_table and benchmark_schema.py
+LEGACY_TABLE_SCHEMA = '''
+    user_id CHAR(36) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    age DECIMAL NOT NULL,
+    INDEX (user_id)
+'''
+
 # 4. Create user_data table if not exists
 def create_table(connection):
     cursor = connection.cursor()
     try:
-        cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
-                user_id CHAR(36) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                age DECIMAL NOT NULL,
-                INDEX (user_id)
-            )
-        ''')
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} ({TABLE_SCHEMA})")
     finally:
         cursor.close()
 
+# 4b. Migrate a CHAR(36) user_data table to the binary key schema
+def migrate_table(connection):
+    """
+    Copy a legacy table into TABLE_SCHEMA and swap it in with one RENAME.
+    The old table is kept as <table>_legacy. Rows with a repeated email are
+    dropped by the new unique key. Does nothing if already migrated.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema=%s AND table_name=%s AND column_name='user_id'",
+            (DB_NAME, TABLE_NAME))
+        column = cursor.fetchone()
+        if not column or column[0].lower() != 'char':
+            return
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE_NAME}_new")
+        cursor.execute(f"CREATE TABLE {TABLE_NAME}_new ({TABLE_SCHEMA})")
+        cursor.execute(f"""
+            INSERT IGNORE INTO {TABLE_NAME}_new (user_id, name, email, age)
+            SELECT UNHEX(REPLACE(user_id, '-', '')), name, email, age FROM {TABLE_NAME}
+        """)
+        cursor.execute(f"RENAME TABLE {TABLE_NAME} TO {TABLE_NAME}_legacy, {TABLE_NAME}_new TO {TABLE_NAME}")
+        connection.commit()
+    finally:
+        cursor.close()
+
+# 4c. Time-ordered 16-byte id (UUIDv7 layout), so inserts append to the primary key
+def new_user_id():
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return value.to_bytes(16, 'big')
+
 # 5. Insert data if not exists
 def insert_data(connection, data):
     cursor = connection.cursor()
     try:
         for row in data:
-            # Check if user already exists by name and email
-            cursor.execute(f"SELECT user_id FROM {TABLE_NAME} WHERE name=%s AND email=%s", (row['name'], row['email']))
-            if cursor.fetchone():
-                continue  # Skip duplicates
-            user_id = str(uuid.uuid4())
-            cursor.execute(f"INSERT INTO {TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
-                           (user_id, row['name'], row['email'], row['age']))
+            # The email unique key skips users that already exist, whatever their name
+            cursor.execute(f"INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s)",
+                           (new_user_id(), row['name'], row['email'], row['age']))
+        connection.commit()
+    finally:
+        cursor.close()
+
+# 5b. Bulk insert, relying on the email unique key to skip duplicates
+def bulk_insert_data(connection, data, batch_size=1000, commit_every=10, id_factory=new_user_id):
+    """
+    Insert rows in batches of `batch_size` with INSERT IGNORE, committing
+    every `commit_every` batches. Accepts any iterable of dicts.
+    """
+    query = f"INSERT IGNORE INTO {TABLE_NAME} (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
+    cursor = connection.cursor()
+    try:
+        batch = []
+        batches = 0
+        for row in data:
+            batch.append((id_factory(), row['name'], row['email'], row['age']))
+            if len(batch) == batch_size:
+                cursor.executemany(query, batch)
+                batch = []
+                batches += 1
+                if batches % commit_every == 0:
+                    connection.commit()
+        if batch:
+            cursor.executemany(query, batch)
         connection.commit()
     finally:
         cursor.close()
@@ -80,6 +156,97 @@ def read_csv_data(filename):
         reader = csv.DictReader(csvfile)
         return list(reader)
 
+# 8. Stream validated CSV batches together with the byte offset after each batch
+def stream_csv_batches(filename, batch_size=1000, offset=0):
+    """
+    Yield (rows, offset) pairs, where offset is the byte position just past
+    the last row of the batch. Rows whose age is not a finite number from
+    MIN_AGE to MAX_AGE (NaN, Infinity, negatives, ...) are skipped and age
+    is converted to Decimal. Pass a previous offset to resume.
+    """
+    with open(filename, 'rb') as csvfile:
+        def lines():
+            while True:
+                line = csvfile.readline()
+                if not line:
+                    return
+                yield line.decode('utf-8')
+
+        reader = csv.reader(lines())
+        header = next(reader)
+        if offset:
+            csvfile.seek(offset)
+        batch = []
+        for values in reader:
+            row = dict(zip(header, values))
+            try:
+                row['age'] = Decimal(row['age'])
+            except (KeyError, InvalidOperation):
+                continue
+            if not row['age'].is_finite() or not MIN_AGE <= row['age'] <= MAX_AGE:
+                continue
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield batch, csvfile.tell()
+                batch = []
+        if batch:
+            yield batch, csvfile.tell()
+
+# 9. Parse and insert concurrently through a bounded queue, checkpointing offsets
+def ingest_csv(connection, filename, batch_size=1000, queue_size=4, checkpoint_file=None):
+    """
+    Parse `filename` on a background thread and insert each batch on this one.
+    At most `queue_size` parsed batches are held in memory. When
+    `checkpoint_file` is given, the offset of every committed batch is written
+    to it and a rerun resumes from there; the file is removed on success.
+    """
+    offset = 0
+    if checkpoint_file and os.path.exists(checkpoint_file):
+        with open(checkpoint_file) as f:
+            offset = int(f.read() or 0)
+
+    batches = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce():
+        try:
+            for item in stream_csv_batches(filename, batch_size, offset):
+                put(item)
+                if stop.is_set():
+                    return
+            put(done)
+        except Exception as exc:
+            put(exc)
+
+    parser = threading.Thread(target=produce, daemon=True)
+    parser.start()
+    try:
+        while True:
+            item = batches.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            rows, offset = item
+            bulk_insert_data(connection, rows, batch_size)
+            if checkpoint_file:
+                with open(checkpoint_file, 'w') as f:
+                    f.write(str(offset))
+    finally:
+        stop.set()
+        parser.join()
+    if checkpoint_file and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
 if __name__ == '__main__':
     # 1. Connect to MySQL server
     conn = connect_db()
@@ -89,10 +256,10 @@ if __name__ == '__main__':
     # 2. Connect to ALX_prodev
     conn = connect_to_prodev()
     create_table(conn)
+    migrate_table(conn)
 
-    # 3. Read CSV and insert data
-    data = read_csv_data(CSV_FILE)
-    insert_data(conn, data)
+    # 3. Stream CSV into the table, resuming from the last checkpoint if any
+    ingest_csv(conn, CSV_FILE, checkpoint_file=CSV_FILE + '.offset')
 
     # 4. Stream rows one by one
     print('Streaming rows:')